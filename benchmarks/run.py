@@ -0,0 +1,214 @@
+"""
+End-to-end benchmark of the quiz pipeline with local stand-ins for every remote service.
+
+Synthetic PDFs replace uploads, HashingEmbeddings (with optional per-call latency) replaces
+Vertex embeddings and FakeQuizLLM replaces the Vertex LLM, so runs need no network and
+differ only by the code under test. Each stage is timed separately:
+
+- parse:    DocumentProcessor.process_files, the parsing behind ingest_documents
+- index:    ChromaCollectionCreator.create_chroma_collection, chunking, embedding and indexing
+- retrieve: similarity_search on the built collection
+- generate: QuizGenerator.generate_quiz
+
+Usage:
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.2
+
+With --baseline, the exit status is 1 if any stage's p50 latency rose, or its throughput fell,
+by more than the threshold. Baselines are only comparable on the same machine and settings.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.synthetic_pdf import VOCABULARY, synthetic_corpus
+from tasks.task_3.task_3 import DocumentProcessor, PageCache
+from tasks.task_4.task_4 import EmbeddingClient
+from tasks.task_4.local_embeddings import HashingEmbeddings
+from tasks.task_5.task_5 import ChromaCollectionCreator
+from tasks.task_7.llm_backends import create_llm
+from tasks.task_8.task_8 import QuizGenerator
+
+class LatencyEmbeddings(Embeddings):
+    """
+    HashingEmbeddings that sleep for 'latency' seconds per call, like a round trip to an embedding API.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.inner = HashingEmbeddings()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self.inner.embed_query(text)
+
+def peak_rss_mb() -> float:
+    """
+    The process's peak resident set size so far, in MiB. ru_maxrss is in KiB on Linux and bytes on macOS.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def summarize(durations, units, unit_name) -> dict:
+    """
+    Summarize the timed runs of a stage: throughput in units per second and run latency percentiles.
+    """
+    durations = np.asarray(durations)
+    return {
+        "runs": len(durations),
+        "unit": unit_name,
+        "units": units,
+        "throughput": round(units / durations.sum(), 2),
+        "p50_ms": round(float(np.percentile(durations, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(durations, 99)) * 1000, 3),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def bench_parse(files, repeats, parallel=False):
+    durations = []
+    for _ in range(repeats):
+        processor = DocumentProcessor(page_cache=PageCache(), parallel=parallel)  # Cold cache, so every run parses
+        start = time.perf_counter()
+        processor.process_files(files)
+        durations.append(time.perf_counter() - start)
+    return summarize(durations, len(processor.pages) * repeats, "pages"), processor
+
+def bench_index(processor, embed_model, vector_store, repeats):
+    durations, chunks = [], 0
+    for repeat in range(repeats):
+        # A fresh in-memory collection per run, so every run chunks and embeds the whole corpus
+        creator = ChromaCollectionCreator(
+            processor, embed_model, collection_name=f"benchmark_{repeat}", vector_store=vector_store
+        )
+        start = time.perf_counter()
+        creator.create_chroma_collection()
+        durations.append(time.perf_counter() - start)
+        if creator.version is None:
+            raise RuntimeError("Indexing failed")
+        chunks += len(creator.db.get()["ids"])
+    return summarize(durations, chunks, "chunks"), creator
+
+def bench_retrieve(store, queries, k=4):
+    durations = []
+    for query in queries:
+        start = time.perf_counter()
+        store.similarity_search(query, k=k)
+        durations.append(time.perf_counter() - start)
+    return summarize(durations, len(queries), "queries")
+
+def bench_generate(vectorstore, llm, topics, num_questions, max_concurrency, generation_mode):
+    durations, questions = [], 0
+    for topic in topics:
+        generator = QuizGenerator(
+            topic=topic,
+            num_questions=num_questions,
+            vectorstore=vectorstore,
+            max_concurrency=max_concurrency,
+            generation_mode=generation_mode
+        )
+        generator.init_llm(llm)
+        start = time.perf_counter()
+        questions += len(generator.generate_quiz())
+        durations.append(time.perf_counter() - start)
+    return summarize(durations, questions, "questions")
+
+def compare(results, baseline, threshold) -> list:
+    """
+    Return a description of every stage whose p50 latency or throughput is worse than the baseline by more than 'threshold'.
+    """
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+        if previous["p50_ms"] > 0 and current["p50_ms"] > previous["p50_ms"] * (1 + threshold):
+            regressions.append(f"{stage}: p50 {previous['p50_ms']} ms -> {current['p50_ms']} ms")
+        if previous["throughput"] > 0 and current["throughput"] < previous["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{stage}: throughput {previous['throughput']} -> {current['throughput']} {current['unit']}/s"
+            )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the quiz pipeline end to end with local stand-ins.")
+    parser.add_argument("--files", type=int, default=4, help="Synthetic PDFs in the corpus.")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per synthetic PDF.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs of the parse and index stages.")
+    parser.add_argument("--queries", type=int, default=200, help="Similarity searches in the retrieve stage.")
+    parser.add_argument("--quizzes", type=int, default=5, help="Quizzes in the generate stage.")
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--max-concurrency", type=int, default=5)
+    parser.add_argument("--generation-mode", choices=["per_question", "batch"], default="per_question")
+    parser.add_argument("--vector-store", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--parallel-parse", action="store_true", help="Parse PDFs in a process pool.")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embedding call.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per LLM call.")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Up to this many extra seconds per LLM call.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare the results with this JSON file.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown that counts as a regression.")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    settings = {name: value for name, value in vars(args).items() if name not in ("save_baseline", "baseline", "threshold")}
+    files = synthetic_corpus(args.files, args.pages, seed=args.seed)
+    embed_model = EmbeddingClient("benchmark-hashing", backend=LatencyEmbeddings(args.embed_latency))
+    llm = create_llm("fake", latency=args.llm_latency, latency_jitter=args.llm_jitter, seed=args.seed)
+
+    stages = {}
+    stages["parse"], processor = bench_parse(files, args.repeats, args.parallel_parse)
+    stages["index"], creator = bench_index(processor, embed_model, args.vector_store, args.repeats)
+
+    topics = [" ".join(VOCABULARY[(i * 7 + j) % len(VOCABULARY)] for j in range(2)) for i in range(args.queries)]
+    stages["retrieve"] = bench_retrieve(creator.db, topics)
+    stages["generate"] = bench_generate(
+        creator.db, llm, topics[:args.quizzes], args.num_questions, args.max_concurrency, args.generation_mode
+    )
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": settings,
+        "stages": stages
+    }
+
+    print(f"{'stage':<10}{'throughput':>23}{'p50 ms':>12}{'p99 ms':>12}{'peak RSS MiB':>14}")
+    for stage, result in stages.items():
+        print(f"{stage:<10}{result['throughput']:>12} {result['unit']:<10}{result['p50_ms']:>12}"
+              f"{result['p99_ms']:>12}{result['peak_rss_mb']:>14}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("settings") != settings:
+            print("Warning: the baseline was recorded with different settings.")
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import io
+import random
+
+VOCABULARY = (
+    "cell energy light membrane protein enzyme glucose oxygen carbon water nucleus chloroplast "
+    "mitochondria ribosome photosynthesis respiration molecule atom electron bond reaction acid "
+    "base solution pressure temperature volume gas liquid solid force motion velocity mass"
+).split()
+
+def make_pdf(pages) -> bytes:
+    """
+    Write a minimal, valid PDF with one text page per entry of 'pages'.
+
+    :param pages: A list of pages, each a list of text lines. Lines must not contain parentheses or backslashes.
+    """
+    n = len(pages)
+    font_id = 3 + 2 * n
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(n))}] /Count {n} >>".encode()
+    ]
+    for i, lines in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        body = "BT /F1 10 Tf 12 TL 40 750 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+def synthetic_corpus(num_files=4, pages_per_file=10, lines_per_page=45, words_per_line=12, seed=0) -> list:
+    """
+    Build a deterministic corpus of PDFs as in-memory files, the way DocumentProcessor receives uploads.
+
+    Every page starts with a heading line so that sections are told apart, followed by sentences drawn from VOCABULARY.
+    """
+    rng = random.Random(seed)
+    files = []
+    for file_number in range(num_files):
+        pages = []
+        for page_number in range(pages_per_file):
+            lines = [f"Chapter {file_number + 1}.{page_number + 1} {rng.choice(VOCABULARY).title()}"]
+            for _ in range(lines_per_page - 1):
+                lines.append(" ".join(rng.choice(VOCABULARY) for _ in range(words_per_line)).capitalize() + ".")
+            pages.append(lines)
+        upload = io.BytesIO(make_pdf(pages))
+        upload.name = f"synthetic_{file_number:03d}.pdf"
+        files.append(upload)
+    return files
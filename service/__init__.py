@@ -0,0 +1,2 @@
+from service.jobs import Job, JobQueue, QueueFullError
+from service.api import QuizService, QuizServer
@@ -0,0 +1,330 @@
+import argparse
+import io
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tasks.task_3.task_3 import DocumentProcessor, PageCache
+from tasks.task_4.task_4 import EmbeddingClient, EmbeddingCache
+from tasks.task_5.task_5 import ChromaCollectionCreator
+from tasks.task_7.llm_backends import create_llm
+from tasks.task_8.task_8 import QuizGenerator
+from tasks.task_8.question_store import QuestionStore
+from service.jobs import JobQueue, QueueFullError
+
+CORPUS_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{2,62}$")  # Also a valid Chroma collection name
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+def check_corpus_name(name):
+    """
+    Raise ValueError unless 'name' can name a corpus and its collection.
+    """
+    if not isinstance(name, str) or not CORPUS_NAME.match(name):
+        raise ValueError("'corpus' must be 3-63 letters, digits, '-' or '_', starting with a letter or digit.")
+
+class Corpus:
+    """
+    The documents and index of one named corpus. Its lock serializes ingesting and indexing.
+
+    Quizzes read the index through reading(), which any number of them can hold at once;
+    indexing waits for them to finish, so the index and its version never change under a quiz.
+    """
+
+    def __init__(self, name, processor, creator):
+        self.name = name
+        self.processor = processor
+        self.creator = creator
+        self.doc_hashes = set()
+        self.lock = threading.Lock()
+        self.readers = 0
+        self.readers_done = threading.Condition(self.lock)
+
+    @contextmanager
+    def reading(self):
+        """
+        Hold the index unchanged for the duration of the block.
+        """
+        with self.lock:
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.readers -= 1
+                if self.readers == 0:
+                    self.readers_done.notify_all()
+
+    def wait_for_readers(self):
+        """
+        Wait until no quiz reads the index. Called with the lock held.
+        """
+        while self.readers:
+            self.readers_done.wait()
+
+class QuizService:
+    """
+    Headless quiz generation around DocumentProcessor, ChromaCollectionCreator and QuizGenerator.
+
+    Each named corpus gets its own collection, so corpora never overwrite each other's chunks.
+    The embedding client, LLM and question store are shared by every corpus and request.
+
+    :param embed_model: The EmbeddingClient used to index and search every corpus.
+    :param llm: The language model used for quiz generation.
+    :param persist_directory: Where collections are persisted; in memory when None.
+    :param vector_store: "chroma" or "numpy", see ChromaCollectionCreator.
+    :param question_store: Optional QuestionStore that serves and keeps generated questions.
+    :param max_concurrency: How many LLM calls one quiz makes at once.
+    """
+
+    def __init__(self, embed_model, llm, persist_directory=None, vector_store="chroma", question_store=None,
+                 max_concurrency=4):
+        self.embed_model = embed_model
+        self.llm = llm
+        self.persist_directory = persist_directory
+        self.vector_store = vector_store
+        self.question_store = question_store
+        self.max_concurrency = max_concurrency
+        self.page_cache = PageCache()
+        self._corpora = {}
+        self._lock = threading.Lock()
+
+    def corpus(self, name, create=False) -> Corpus:
+        """
+        Return the named corpus, creating it when 'create' is set.
+
+        Raises:
+        - ValueError: If the name is invalid, or the corpus does not exist and 'create' is not set.
+        """
+        check_corpus_name(name)
+        with self._lock:
+            if name not in self._corpora:
+                if not create:
+                    raise ValueError(f"Unknown corpus: {name}")
+                processor = DocumentProcessor(page_cache=self.page_cache)
+                creator = ChromaCollectionCreator(
+                    processor, self.embed_model, persist_directory=self.persist_directory,
+                    collection_name=name, vector_store=self.vector_store
+                )
+                self._corpora[name] = Corpus(name, processor, creator)
+            return self._corpora[name]
+
+    def ingest(self, corpus, file_name, data) -> dict:
+        """
+        Parse a PDF and add its pages to the corpus. A file the corpus already holds is not added again.
+        """
+        upload = io.BytesIO(data)
+        upload.name = file_name
+        doc_hash = PageCache.key_for(data)
+        with corpus.lock:
+            if doc_hash not in corpus.doc_hashes:
+                corpus.processor.process_files([upload])
+                corpus.doc_hashes.add(doc_hash)
+            return {"corpus": corpus.name, "file": file_name, "doc_hash": doc_hash,
+                    "documents": len(corpus.doc_hashes), "pages": len(corpus.processor.pages)}
+
+    def build_index(self, corpus) -> dict:
+        """
+        Create or update the corpus collection from its ingested pages.
+        """
+        with corpus.lock:
+            if not corpus.processor.pages:
+                raise ValueError("No documents have been ingested into this corpus.")
+            corpus.wait_for_readers()
+            corpus.creator.create_chroma_collection()
+            if corpus.creator.version is None:
+                raise RuntimeError("Failed to build the index; see the service log for details.")
+            return {"corpus": corpus.name, "version": corpus.creator.version, "pages": len(corpus.processor.pages)}
+
+    def generate_quiz(self, corpus, topic, num_questions, generation_mode="per_question") -> dict:
+        """
+        Generate a quiz on a topic from the corpus index.
+        """
+        # /build-index waits for this quiz, so the index and version read here stay together
+        with corpus.reading():
+            vectorstore = corpus.creator.get_vectorstore()
+            version = corpus.creator.version
+            if vectorstore is None or version is None:
+                raise ValueError("This corpus has no index yet; call /build-index first.")
+
+            generator = QuizGenerator(
+                topic=topic,
+                num_questions=num_questions,
+                vectorstore=vectorstore,
+                max_concurrency=min(num_questions, self.max_concurrency),
+                generation_mode=generation_mode,
+                question_store=self.question_store,
+                corpus_key=version
+            )
+            generator.init_llm(self.llm)
+            questions = generator.generate_quiz()
+        return {"corpus": corpus.name, "topic": generator.topic, "version": version,
+                "questions": questions, "parsing": dict(generator.parser.metrics)}
+
+class _BodyTooLarge(Exception):
+    pass
+
+class QuizRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints of the quiz service. Work is queued on the server's JobQueue and polled by job ID.
+
+    POST /ingest?corpus=<name>&filename=<file.pdf>   body: the PDF bytes
+    POST /build-index                                  body: {"corpus": <name>}
+    POST /generate-quiz                                body: {"corpus": <name>, "topic": ..., "num_questions": 1-10}
+    GET  /jobs/<id>
+    GET  /health
+    """
+
+    server_version = "Quizzify/1.0"
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            return self._send_json(HTTPStatus.OK, {"status": "ok", **self.server.jobs.stats()})
+        if path.startswith("/jobs/"):
+            job = self.server.jobs.get(path[len("/jobs/"):])
+            if job is None:
+                return self._send_error(HTTPStatus.NOT_FOUND, "Unknown job.")
+            return self._send_json(HTTPStatus.OK, job.to_dict())
+        self._send_error(HTTPStatus.NOT_FOUND, "Not found.")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        service = self.server.service
+        try:
+            if url.path == "/ingest":
+                query = parse_qs(url.query)
+                file_name = query.get("filename", ["upload.pdf"])[0]
+                corpus_name = query.get("corpus", [None])[0]
+                check_corpus_name(corpus_name)
+                data = self._read_body()
+                if not data.startswith(b"%PDF"):
+                    raise ValueError("The request body must be a PDF file.")
+                # Only a valid upload creates the corpus
+                corpus = service.corpus(corpus_name, create=True)
+                return self._submit("ingest", service.ingest, corpus, file_name, data)
+
+            if url.path == "/build-index":
+                body = self._read_json()
+                return self._submit("build-index", service.build_index, service.corpus(body.get("corpus")))
+
+            if url.path == "/generate-quiz":
+                body = self._read_json()
+                corpus = service.corpus(body.get("corpus"))
+                num_questions = body.get("num_questions", 3)
+                if isinstance(num_questions, bool) or not isinstance(num_questions, int) or not 1 <= num_questions <= 10:
+                    raise ValueError("'num_questions' must be an integer from 1 to 10.")
+                generation_mode = body.get("generation_mode", "per_question")
+                if generation_mode not in ("per_question", "batch"):
+                    raise ValueError("'generation_mode' must be 'per_question' or 'batch'.")
+                return self._submit(
+                    "generate-quiz", service.generate_quiz, corpus, body.get("topic"), num_questions, generation_mode
+                )
+        except ValueError as e:
+            return self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+        except _BodyTooLarge:
+            return self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "The request body is too large.")
+        self._send_error(HTTPStatus.NOT_FOUND, "Not found.")
+
+    def _submit(self, kind, fn, *args):
+        try:
+            job = self.server.jobs.submit(kind, fn, *args)
+        except QueueFullError as e:
+            return self._send_error(HTTPStatus.TOO_MANY_REQUESTS, f"The service is busy: {e}", {"Retry-After": "1"})
+        self._send_json(HTTPStatus.ACCEPTED, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def _read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ValueError("Invalid Content-Length header.")
+        if length < 0:
+            raise ValueError("Invalid Content-Length header.")
+        if length > MAX_UPLOAD_BYTES:
+            raise _BodyTooLarge()
+        return self.rfile.read(length)
+
+    def _read_json(self) -> dict:
+        try:
+            body = json.loads(self._read_body() or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+        if not isinstance(body, dict):
+            raise ValueError("The JSON body must be an object.")
+        return body
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {"error": message}, headers)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class QuizServer(ThreadingHTTPServer):
+    """
+    HTTP server whose request threads only validate and enqueue; the JobQueue workers do the work.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, service, jobs):
+        super().__init__(address, QuizRequestHandler)
+        self.service = service
+        self.jobs = jobs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Quizzify quiz generation service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="Jobs that run at once.")
+    parser.add_argument("--max-pending", type=int, default=16, help="Jobs that may wait before requests get 429.")
+    parser.add_argument("--llm", choices=["vertex", "fake"], default="vertex")
+    parser.add_argument("--embeddings", choices=["vertex", "hashing"], default="vertex")
+    parser.add_argument("--model-name", default="textembedding-gecko@003")
+    parser.add_argument("--project", default="gemini-explorer-423214")
+    parser.add_argument("--location", default="us-central1")
+    parser.add_argument("--vector-store", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--persist-directory", default="chroma_db")
+    parser.add_argument("--embedding-cache", default="embedding_cache.sqlite3")
+    parser.add_argument("--question-store", default="question_store.sqlite3")
+    args = parser.parse_args(argv)
+
+    # The pipeline reports progress through Streamlit widgets, which only log warnings outside an app
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    embed_client = EmbeddingClient(
+        args.model_name, args.project, args.location,
+        cache=EmbeddingCache(args.embedding_cache), backend=args.embeddings
+    )
+    service = QuizService(
+        embed_client,
+        create_llm(args.llm, **({"max_output_tokens": 400} if args.llm == "vertex" else {})),
+        persist_directory=args.persist_directory,
+        vector_store=args.vector_store,
+        question_store=QuestionStore(args.question_store)
+    )
+    jobs = JobQueue(max_workers=args.workers, max_pending=args.max_pending)
+    server = QuizServer((args.host, args.port), service, jobs)
+    print(f"Serving on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        jobs.shutdown(wait=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tasks.task_3.task_3 import DocumentProcessor
+from tasks.task_4.task_4 import EmbeddingClient, EmbeddingCache
+from tasks.task_5.task_5 import ChromaCollectionCreator
+from tasks.task_7.llm_backends import create_llm
+from tasks.task_8.task_8 import QuizGenerator
+
+FILES_PER_BATCH = 16  # PDFs held in memory at once while ingesting
+
+_worker = {}  # Per-process state set up by _init_worker
+
+def iter_pdf_batches(pdf_dir, batch_size=FILES_PER_BATCH):
+    """
+    Yield the PDFs of a directory, sorted by name, as lists of in-memory files with a 'name' attribute.
+    """
+    names = sorted(name for name in os.listdir(pdf_dir) if name.lower().endswith(".pdf"))
+    for start in range(0, len(names), batch_size):
+        batch = []
+        for name in names[start:start + batch_size]:
+            with open(os.path.join(pdf_dir, name), "rb") as pdf_file:
+                upload = io.BytesIO(pdf_file.read())
+            upload.name = name
+            batch.append(upload)
+        yield batch
+
+def read_topics(path) -> list:
+    """
+    Read one topic per line, skipping blank lines, comments and repeats.
+    """
+    with open(path, encoding="utf-8") as topics_file:
+        lines = (line.strip() for line in topics_file)
+        return list(dict.fromkeys(line for line in lines if line and not line.startswith("#")))
+
+def check_resumable(checkpoint_path, output_path):
+    """
+    Refuse to write to an existing, non-empty output that has no checkpoint, which would mix in or lose earlier results.
+    """
+    if not os.path.exists(checkpoint_path) and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        raise ValueError(
+            f"{output_path} already holds questions but its checkpoint {checkpoint_path} does not exist; "
+            f"pass the checkpoint it was written with, or choose another output file."
+        )
+
+def load_checkpoint(checkpoint_path, output_path, version) -> set:
+    """
+    Return the topics already written for this collection version, and cut the output back to the last checkpoint.
+
+    Every checkpoint line records the output size after its topic was written, so anything past
+    the last recorded size is a partly written topic from a killed run and is discarded. The output
+    is only cut when the checkpoint exists; see check_resumable for an output without one.
+    """
+    check_resumable(checkpoint_path, output_path)
+    if not os.path.exists(checkpoint_path):
+        return set()
+
+    done, offset = set(), 0
+    with open(checkpoint_path, encoding="utf-8") as checkpoint_file:
+        for line in checkpoint_file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by the kill
+            offset = max(offset, entry["offset"])
+            if entry["version"] == version:
+                done.add(entry["topic"])
+    if os.path.exists(output_path):
+        with open(output_path, "r+b") as output_file:
+            output_file.truncate(offset)
+    return done
+
+def build_collection(pdf_dir, embed_client, store_config, parallel=True):
+    """
+    Parse every PDF in the directory and create or update one collection from them.
+
+    :return: The collection version, which identifies the exact set of indexed chunks.
+    """
+    processor = DocumentProcessor(parallel=parallel)
+    for batch in iter_pdf_batches(pdf_dir):
+        processor.process_files(batch)
+        print(f"Parsed {len(processor.pages)} pages so far")
+    if not processor.pages:
+        raise ValueError(f"No PDF pages found in {pdf_dir}")
+
+    creator = ChromaCollectionCreator(processor, embed_client, **store_config)
+    creator.create_chroma_collection()
+    if creator.version is None:
+        raise RuntimeError("Failed to build the collection")
+    return creator.version
+
+def _init_worker(config):
+    # Open the shared clients and the persisted collection once per worker process
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    embed_client = EmbeddingClient(**config["embeddings"], cache=EmbeddingCache(config["embedding_cache"]))
+    creator = ChromaCollectionCreator(None, embed_client, **config["store"])
+    creator.db = creator.open_store()
+    creator.version = config["version"]
+    _worker["vectorstore"] = creator.get_vectorstore()
+    _worker["llm"] = create_llm(config["llm"], **config["llm_kwargs"])
+    _worker["config"] = config
+
+def _generate_topic(topic) -> list:
+    config = _worker["config"]
+    generator = QuizGenerator(
+        topic=topic,
+        num_questions=config["num_questions"],
+        vectorstore=_worker["vectorstore"],
+        max_concurrency=config["max_concurrency"],
+        generation_mode=config["generation_mode"]
+    )
+    generator.init_llm(_worker["llm"])
+    return generator.generate_quiz()
+
+def run_batch(topics, output_path, checkpoint_path, config, workers=None):
+    """
+    Generate a quiz for every topic not yet checkpointed, across worker processes, appending questions to JSONL.
+
+    Each topic's questions are written and flushed as soon as its worker finishes, followed by its checkpoint line.
+
+    :return: A (topics written, questions written, topics failed) tuple.
+    """
+    done = load_checkpoint(checkpoint_path, output_path, config["version"])
+    pending = [topic for topic in topics if topic not in done]
+    print(f"{len(done)} topic(s) already done, {len(pending)} to go")
+    if not pending:
+        return 0, 0, 0
+
+    written = questions = failed = 0
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(config,)
+    )
+    with pool, open(output_path, "ab") as output_file, open(checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+        futures = {pool.submit(_generate_topic, topic): topic for topic in pending}
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                bank = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Failed to generate questions for '{topic}': {e}")
+                continue  # Not checkpointed, so the next run tries it again
+
+            for question in bank:
+                record = {"topic": topic, "version": config["version"], **question}
+                output_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            output_file.flush()
+            os.fsync(output_file.fileno())
+
+            checkpoint_file.write(json.dumps({"topic": topic, "version": config["version"], "offset": output_file.tell()}) + "\n")
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+            written += 1
+            questions += len(bank)
+            print(f"[{written + failed}/{len(pending)}] {topic}: {len(bank)} question(s)")
+    return written, questions, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate quizzes for a directory of PDFs and a list of topics.")
+    parser.add_argument("pdf_dir", help="Directory of PDF files to index.")
+    parser.add_argument("topics", help="Text file with one quiz topic per line.")
+    parser.add_argument("--output", default="quizzes.jsonl", help="JSONL file the questions are appended to.")
+    parser.add_argument("--checkpoint", help="Progress file for resuming; defaults to <output>.checkpoint.")
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--generation-mode", choices=["per_question", "batch"], default="per_question")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes; defaults to the number of CPUs.")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="LLM calls in flight per worker.")
+    parser.add_argument("--llm", choices=["vertex", "fake"], default="vertex")
+    parser.add_argument("--embeddings", choices=["vertex", "hashing"], default="vertex")
+    parser.add_argument("--model-name", default="textembedding-gecko@003")
+    parser.add_argument("--project", default="gemini-explorer-423214")
+    parser.add_argument("--location", default="us-central1")
+    parser.add_argument("--vector-store", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--persist-directory", default="batch_db")
+    parser.add_argument("--collection-name", default="quizzify_batch")
+    parser.add_argument("--embedding-cache", default="embedding_cache.sqlite3")
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.num_questions <= 10:
+        parser.error("--num-questions must be from 1 to 10")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    embeddings = {"model_name": args.model_name, "project": args.project, "location": args.location,
+                  "backend": args.embeddings}
+    store_config = {"persist_directory": args.persist_directory, "collection_name": args.collection_name,
+                    "vector_store": args.vector_store}
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    try:
+        check_resumable(checkpoint_path, args.output)  # Before the expensive indexing
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Step 1: Index the documents once; workers open the persisted collection
+    embed_client = EmbeddingClient(**embeddings, cache=EmbeddingCache(args.embedding_cache))
+    version = build_collection(args.pdf_dir, embed_client, store_config)
+    embed_client.cache.close()
+    print(f"Collection {args.collection_name} is at version {version}")
+
+    # Step 2: Fan the topics out across worker processes
+    config = {
+        "version": version,
+        "embeddings": embeddings,
+        "embedding_cache": args.embedding_cache,
+        "store": store_config,
+        "llm": args.llm,
+        "llm_kwargs": {"max_output_tokens": 400} if args.llm == "vertex" else {},
+        "num_questions": args.num_questions,
+        "generation_mode": args.generation_mode,
+        "max_concurrency": args.max_concurrency
+    }
+    written, questions, failed = run_batch(
+        read_topics(args.topics), args.output, checkpoint_path, config, args.workers
+    )
+    print(f"Wrote {questions} question(s) for {written} topic(s) to {args.output}; {failed} topic(s) failed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import itertools
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class QueueFullError(Exception):
+    """
+    Raised by JobQueue.submit when every worker is busy and the pending queue is full.
+    """
+
+class Job:
+    """
+    One unit of work submitted to a JobQueue, with its status and, once finished, its result or error.
+    """
+
+    def __init__(self, job_id, kind):
+        self.id = job_id
+        self.kind = kind
+        self.status = "queued"  # queued -> running -> done | failed
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self) -> dict:
+        job = {"id": self.id, "kind": self.kind, "status": self.status, "created": self.created}
+        if self.started is not None:
+            job["queued_seconds"] = round(self.started - self.created, 3)
+        if self.finished is not None:
+            job["run_seconds"] = round(self.finished - self.started, 3)
+        if self.status == "done":
+            job["result"] = self.result
+        elif self.status == "failed":
+            job["error"] = self.error
+        return job
+
+class JobQueue:
+    """
+    Bounded worker pool with a bounded queue in front of it.
+
+    At most 'max_workers' jobs run at once and at most 'max_pending' more wait for a worker.
+    Beyond that, submit raises QueueFullError straight away instead of queueing without limit,
+    so a saturated service rejects work (HTTP 429) rather than building an ever longer backlog.
+    Finished jobs are kept for polling, the oldest dropped once there are more than 'keep_finished'.
+
+    :param max_workers: How many jobs run concurrently.
+    :param max_pending: How many jobs may wait for a free worker.
+    :param keep_finished: How many finished jobs to keep for status requests.
+    """
+
+    def __init__(self, max_workers=4, max_pending=16, keep_finished=1000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.rejected = 0
+        self._jobs = OrderedDict()
+        self._active = 0  # Queued plus running jobs
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-job")
+
+    def submit(self, kind, fn, *args, **kwargs) -> Job:
+        """
+        Queue fn(*args, **kwargs) as a job of the given kind.
+
+        Raises:
+        - QueueFullError: If the workers and the pending queue are all taken.
+        """
+        with self._lock:
+            if self._active >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"{self._active} jobs are already queued or running.")
+            self._active += 1
+            job = Job(f"{next(self._ids):08d}", kind)
+            self._jobs[job.id] = job
+            self._trim()
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """
+        Return the job with the given ID, or None if it is unknown or has been dropped.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = sum(job.status == "running" for job in self._jobs.values())
+            return {
+                "running": running,
+                "queued": self._active - running,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "rejected": self.rejected
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e) or type(e).__name__
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._active -= 1
+                self._trim()
+
+    def _trim(self):
+        # Drop the oldest finished jobs; jobs still queued or running are always kept
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
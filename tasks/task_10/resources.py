@@ -0,0 +1,128 @@
+import atexit
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+class ResourceManager:
+    """
+    Builds heavy, thread-safe objects once per process and shares them across reruns and sessions.
+
+    Streamlit re-executes the whole script on every interaction, so anything built at the top
+    of it (API clients, vector stores, database connections) is built again on every click.
+    Resources are registered under a hashable key, usually the kind of resource plus its
+    configuration, and built by their factory on first use. invalidate drops and closes a
+    resource so the next get builds a fresh one, and every resource is closed at interpreter exit.
+
+    Kinds with one resource per user or corpus can be capped with 'limits': once a kind holds
+    more resources than its limit, the least recently used ones are dropped and closed.
+
+    :param limits: Optional mapping of a key's kind (its first element) to the most resources of that kind kept.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(limits or {})
+        self._resources = OrderedDict()  # key -> resource, least recently used first
+        self._closers = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def get(self, key, factory, close=None):
+        """
+        Return the resource for a key, building it with 'factory' if it does not exist yet.
+
+        Concurrent callers for the same key wait for a single build instead of each building one.
+
+        :param close: Called with the resource when it is dropped; by default its close or shutdown method is.
+        """
+        with self._lock:
+            resource = self._resources.get(key)
+            if resource is not None:
+                self._resources.move_to_end(key)
+                return resource
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                resource = self._resources.get(key)
+            if resource is None:
+                resource = factory()
+                with self._lock:
+                    self._resources[key] = resource
+                    if close is not None:
+                        self._closers[key] = close
+                    evicted = self._evict(key[0] if isinstance(key, tuple) else None)
+                for _, old_resource, closer in evicted:
+                    self._close(old_resource, closer)
+        return resource
+
+    def _evict(self, kind):
+        """
+        Pop the least recently used resources of a kind beyond its limit. Called with the lock held.
+        """
+        limit = self.limits.get(kind)
+        if limit is None:
+            return []
+        keys = [key for key in self._resources if isinstance(key, tuple) and key[0] == kind]
+        evicted = []
+        for key in keys[:max(0, len(keys) - limit)]:
+            self._key_locks.pop(key, None)
+            evicted.append((key, self._resources.pop(key), self._closers.pop(key, None)))
+        return evicted
+
+    def invalidate(self, key=None, kind=None):
+        """
+        Drop and close one resource by key, or every resource whose key starts with 'kind'.
+        """
+        with self._lock:
+            keys = [
+                existing for existing in self._resources
+                if existing == key or (kind is not None and isinstance(existing, tuple) and existing[0] == kind)
+            ]
+            dropped = [(self._resources.pop(existing), self._closers.pop(existing, None)) for existing in keys]
+        for resource, closer in dropped:
+            self._close(resource, closer)
+
+    def shutdown(self):
+        """
+        Close every resource. Called automatically when the process exits.
+        """
+        with self._lock:
+            dropped = [(resource, self._closers.get(key)) for key, resource in self._resources.items()]
+            self._resources.clear()
+            self._closers.clear()
+        for resource, closer in dropped:
+            self._close(resource, closer)
+
+    @staticmethod
+    def _close(resource, closer=None):
+        if closer is not None:
+            try:
+                closer(resource)
+            except Exception as e:
+                print(f"Failed to close {type(resource).__name__}: {e}")
+            return
+        for method in ("close", "shutdown"):
+            if callable(getattr(resource, method, None)):
+                try:
+                    getattr(resource, method)()
+                except Exception as e:
+                    print(f"Failed to close {type(resource).__name__}: {e}")
+                return
+
+    def __len__(self):
+        return len(self._resources)
+
+@st.cache_resource
+def get_resource_manager():
+    """
+    Return the process-wide ResourceManager. It keeps the vector stores of at most 32 sessions.
+    """
+    return ResourceManager(limits={"session_store": 32})
+
+def config_key(kind, config) -> tuple:
+    """
+    Build a resource key from its kind and a configuration dictionary.
+    """
+    return (kind, *sorted((name, repr(value)) for name, value in config.items()))
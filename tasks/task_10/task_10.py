@@ -1,14 +1,18 @@
 import streamlit as st
 import os
 import sys
-import json
-import re  # Import regex module to clean JSON strings
+import threading
+import time
+import uuid
 sys.path.append(os.path.abspath('../../'))
 from tasks.task_3.task_3 import DocumentProcessor
-from tasks.task_4.task_4 import EmbeddingClient
+from tasks.task_4.task_4 import EmbeddingClient, get_embedding_cache
 from tasks.task_5.task_5 import ChromaCollectionCreator
 from tasks.task_8.task_8 import QuizGenerator
-from tasks.task_9.task_9 import QuizManager
+from tasks.task_8.question_store import get_question_store
+from tasks.task_8.pregeneration import start_pregeneration
+from tasks.task_9.task_9 import QuizManager, QuizQuestion
+from tasks.task_10.resources import config_key, get_resource_manager
 
 # Helper function to initialize session state variables
 def initialize_session_state():
@@ -18,12 +22,52 @@ def initialize_session_state():
         st.session_state['question_index'] = 0
     if 'display_quiz' not in st.session_state:
         st.session_state['display_quiz'] = False
-
-# Clean the JSON string by removing unwanted formatting
-def clean_json_string(json_string):
-    # Remove any ```json``` or other markdown-like wrapping
-    cleaned_string = re.sub(r'```json|```', '', json_string).strip()
-    return cleaned_string
+    if 'quiz_stream' not in st.session_state:
+        st.session_state['quiz_stream'] = None
+    if 'processor' not in st.session_state:
+        st.session_state['processor'] = None
+    if 'chroma_creator' not in st.session_state:
+        st.session_state['chroma_creator'] = None
+    if 'library_id' not in st.session_state:
+        st.session_state['library_id'] = uuid.uuid4().hex[:16]
+
+class QuizStream:
+    """
+    Generates the questions of a quiz on a background thread and exposes them as they arrive.
+
+    'question_bank' holds a compact QuizQuestion record for every question the generator accepts, so it grows
+    in place while the quiz is being taken. The generator, with its raw responses and contexts, is released once
+    generation finishes. The thread makes no Streamlit calls; the script polls 'question_bank' and 'done' instead.
+    """
+
+    def __init__(self, generator, num_questions):
+        self.generator = generator
+        self.num_questions = num_questions
+        self.question_bank = []
+        self.done = False
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        generator = self.generator
+        try:
+            # Take each accepted question as soon as its call finishes, not in request order
+            for question in generator.iter_quiz(in_order=False):
+                self.question_bank.append(QuizQuestion.from_dict(question))
+            print(f"Question parsing: {generator.parser.metrics}")
+        except Exception as e:
+            self.error = e
+        finally:
+            self.generator = None  # Only the compact records stay in session state
+            self.done = True
+
+    def wait_for_first_question(self, poll_interval=0.1):
+        while not self.question_bank and not self.done:
+            time.sleep(poll_interval)
 
 # Step 1: Initialize session state variables
 initialize_session_state()
@@ -34,61 +78,94 @@ if __name__ == "__main__":
         "project": "gemini-explorer-423214",
         "location": "us-central1"
     }
+    # Each session indexes its uploads into its own in-memory collection. A collection that was evicted
+    # is rebuilt from the persistent embedding cache without API calls. Every session uses the same owner
+    # tag, so the same documents get the same chunk IDs and version, and share stored questions.
+    store_config = {
+        "collection_name": f"quizzify-{st.session_state['library_id']}",
+        "vector_store": "chroma",
+        "owner": "quizzify"
+    }
+
+    # Clients are built once per process and shared by every rerun and session
+    resources = get_resource_manager()
+    embed_client = resources.get(
+        config_key("embedding_client", embed_config),
+        lambda: EmbeddingClient(**embed_config, cache=get_embedding_cache())
+    )
 
     screen = st.empty()
     with screen.container():
         st.header("Quiz Builder")
 
-        # Initialize Document Processor and Embedding Client
-        processor = DocumentProcessor()
+        # Initialize the Document Processor and collection creator once per session; they hold this user's pages
+        if st.session_state['processor'] is None:
+            st.session_state['processor'] = DocumentProcessor()
+            st.session_state['chroma_creator'] = ChromaCollectionCreator(
+                st.session_state['processor'], embed_client, **store_config
+            )
+        processor = st.session_state['processor']
+        chroma_creator = st.session_state['chroma_creator']
         processor.ingest_documents()
 
-        embed_client = EmbeddingClient(**embed_config)
-        chroma_creator = ChromaCollectionCreator(processor, embed_client)
-
         # Step 2: Set topic input and number of questions
         with st.form("Load Data to Chroma"):
             st.write("Select PDFs for Ingestion, the topic for the quiz, and click Generate!")
 
             topic_input = st.text_input("Enter the quiz topic:")
             questions = st.slider("Number of Questions", min_value=1, max_value=10, value=3)
+            pregenerate = st.checkbox("Pre-generate questions for every section in the background")
 
             submitted = st.form_submit_button("Submit")
 
             if submitted:
+                # The session's collection is upserted in place, so adding a PDF indexes only that PDF.
+                # Only the 32 most recently used session collections are kept; an evicted one is dropped
+                # and rebuilt here on the session's next submit.
+                chroma_creator.db = resources.get(
+                    ("session_store", st.session_state['library_id']),
+                    chroma_creator.open_store,
+                    close=lambda store: store.delete_collection()
+                )
                 chroma_creator.create_chroma_collection()
-                vectorstore = chroma_creator.db
+                vectorstore = chroma_creator.get_vectorstore()
 
                 if vectorstore:
                     st.write(f"Generating {questions} questions for topic: {topic_input}")
 
                     # Step 3: Initialize QuizGenerator
-                    generator = QuizGenerator(topic=topic_input, num_questions=questions, vectorstore=vectorstore)
-                    generator.init_llm()
-                    question_bank = []
-
-                    for i in range(questions):
-                        question_str = generator.generate_question_with_vectorstore()
-
-                        # Debug: Output the raw JSON string
-                        print(f"Generated question JSON: {question_str}")
-
-                        # Clean the JSON string before attempting to decode it
-                        question_str_cleaned = clean_json_string(question_str)
-                        
-                        try:
-                            question = json.loads(question_str_cleaned)
-                            question_bank.append(question)  # Only add valid questions
-                        except json.JSONDecodeError as e:
-                            print(f"Failed to decode question JSON: {e}")
-                            continue
+                    generator = QuizGenerator(
+                        topic=topic_input,
+                        num_questions=questions,
+                        vectorstore=vectorstore,
+                        max_concurrency=questions,
+                        question_store=get_question_store(),
+                        corpus_key=chroma_creator.version,
+                        serve_sections=pregenerate
+                    )
+                    def build_llm():
+                        generator.init_llm()
+                        return generator.llm
+                    generator.llm = resources.get(("llm", "vertex"), build_llm)
+
+                    # Warm the question pool for the whole corpus while this quiz is generated and taken
+                    if pregenerate and chroma_creator.version:
+                        start_pregeneration(chroma_creator, get_question_store(), llm=generator.llm)
+
+                    # Generate in the background and open the quiz as soon as the first question is ready
+                    stream = QuizStream(generator, questions).start()
+                    with st.spinner("Generating the first question..."):
+                        stream.wait_for_first_question()
 
                     # Handle empty question bank
-                    if len(question_bank) == 0:
+                    if len(stream.question_bank) == 0:
                         st.error("No valid questions were generated. Please try again with a different topic or input.")
+                        if stream.error:
+                            st.error(f"Error: {stream.error}")
                     else:
-                        # Step 4: Store the question bank in Streamlit's session state
-                        st.session_state['question_bank'] = question_bank
+                        # Step 4: Store the growing question bank in Streamlit's session state
+                        st.session_state['question_bank'] = stream.question_bank
+                        st.session_state['quiz_stream'] = stream
 
                         # Step 5: Set display_quiz flag in session state
                         st.session_state['display_quiz'] = True
@@ -101,40 +178,53 @@ if __name__ == "__main__":
         with st.container():
             st.header("Generated Quiz Questions: ")
 
-            # Initialize QuizManager with the question bank
-            quiz_manager = QuizManager(st.session_state['question_bank'])
+            # Report progress while the remaining questions are still being generated
+            stream = st.session_state['quiz_stream']
+            if stream is not None and not stream.done:
+                @st.fragment(run_every=1.0)
+                def show_generation_progress():
+                    if stream.done:
+                        st.rerun()  # Full rerun, which also stops this polling
+                    st.caption(f"{len(stream.question_bank)} of {stream.num_questions} questions ready, generating the rest...")
+
+                show_generation_progress()
+            elif stream is not None and stream.error and stream.question_bank:
+                # Generation stopped after the first questions; the quiz holds the ones that were ready
+                st.warning(f"Only {len(stream.question_bank)} of {stream.num_questions} questions could be generated. "
+                           f"Error: {stream.error}")
+
+            # The question panel reruns on its own, so answering and navigating skip the ingest screen
+            @st.fragment
+            def show_question_panel():
+                # Initialize QuizManager with the question bank
+                quiz_manager = QuizManager(st.session_state['question_bank'])
+
+                # Ensure there are questions in the bank
+                if quiz_manager.total_questions == 0:
+                    st.error("No questions available to display.")
+                    return
 
-            # Ensure there are questions in the bank
-            if quiz_manager.total_questions == 0:
-                st.error("No questions available to display.")
-            else:
                 # Step 7: Set index_question
                 index_question = quiz_manager.get_question_at_index(st.session_state['question_index'])
 
-                # Format choices for radio button
-                choices = [f"{choice['key']}) {choice['value']}" for choice in index_question['choices']]
-
                 with st.form("MCQ"):
-                    st.write(f"{st.session_state['question_index'] + 1}. {index_question['question']}")
-                    answer = st.radio("Choose an answer", choices)
+                    st.write(f"{st.session_state['question_index'] + 1}. {index_question.question}")
+                    answer = st.radio("Choose an answer", index_question.choice_labels)
 
                     answer_choice = st.form_submit_button("Submit")
 
                     if answer_choice:
-                        correct_answer_key = index_question['answer']
-                        if answer.startswith(correct_answer_key):
+                        if index_question.is_correct(answer):
                             st.success("Correct!")
                         else:
                             st.error("Incorrect!")
-                        st.write(f"Explanation: {index_question['explanation']}")
+                        st.write(f"Explanation: {index_question.explanation}")
 
-                # Move navigation buttons outside the form
+                # Move navigation buttons outside the form; their callbacks update the index before the panel reruns
                 col1, col2 = st.columns(2)
                 with col1:
-                    if st.button("Previous Question"):
-                        st.session_state['question_index'] = (st.session_state['question_index'] - 1) % quiz_manager.total_questions
-                        st.rerun()  # Refresh to show the previous question
+                    st.button("Previous Question", on_click=quiz_manager.next_question_index, args=(-1,))
                 with col2:
-                    if st.button("Next Question"):
-                        st.session_state['question_index'] = (st.session_state['question_index'] + 1) % quiz_manager.total_questions
-                        st.rerun()  # Refresh to show the next question
+                    st.button("Next Question", on_click=quiz_manager.next_question_index, args=(1,))
+
+            show_question_panel()
@@ -1,14 +1,133 @@
 # pdf_processing.py
 
 import streamlit as st
-from langchain_community.document_loaders import PyPDFLoader
-import os
-import tempfile
-import uuid
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+class PageCache:
+    """
+    Size-bounded LRU cache of parsed PDF pages, keyed by the SHA-256 of the uploaded bytes.
+
+    A single instance is shared by the whole process (see get_page_cache), so Streamlit reruns
+    and other sessions that upload the same file skip PDF parsing entirely. The size bound is
+    measured in characters of page text, which tracks the memory held by the cached pages.
+
+    :param max_chars: Total page text the cache may hold before evicting least recently used files.
+    """
+
+    def __init__(self, max_chars=50_000_000):
+        self.max_chars = max_chars
+        self.total_chars = 0
+        self._entries = OrderedDict()  # key -> (pages, size), oldest first
+        self._lock = threading.Lock()  # Streamlit serves each session from its own thread
+
+    @staticmethod
+    def key_for(data) -> str:
+        """
+        Compute the cache key for the raw bytes of an uploaded file.
+        """
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached pages for a key, or None on a miss. A hit marks the entry as most recently used.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return list(entry[0])
+
+    def put(self, key, pages):
+        """
+        Store parsed pages for a key, evicting least recently used entries until the cache fits its bound.
+        """
+        size = sum(len(page.page_content) for page in pages)
+        if size > self.max_chars:
+            return  # A single file larger than the whole cache is not worth keeping
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_chars -= previous[1]
+
+            self._entries[key] = (tuple(pages), size)
+            self.total_chars += size
+
+            while self.total_chars > self.max_chars:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_chars -= evicted_size
+
+    def __len__(self):
+        return len(self._entries)
+
+@st.cache_resource
+def get_page_cache():
+    """
+    Return the process-wide PageCache shared across reruns and sessions.
+    """
+    return PageCache()
+
+def iter_pdf_pages(file_name, stream):
+    """
+    Lazily yield one Document per page of a PDF read from an in-memory stream.
+
+    :param file_name: The original name of the uploaded file, recorded as the page 'source'.
+    :param stream: A seekable binary stream holding the PDF.
+    """
+    reader = PdfReader(stream)
+    for page_number, page in enumerate(reader.pages):
+        yield Document(
+            page_content=page.extract_text(),
+            metadata={"source": file_name, "page": page_number}
+        )
+
+def load_pdf_pages(file_name, data):
+    """
+    Parse a PDF held in memory into pages, split the same way as PyPDFLoader.load_and_split.
+
+    Nothing is written to disk: the PDF is read straight from the upload's buffer. This is a
+    module-level function so it can be shipped to worker processes.
+
+    :param file_name: The original name of the uploaded file.
+    :param data: The PDF as bytes, or a seekable binary stream such as the uploaded file itself.
+    :return: The list of pages extracted from the PDF.
+    """
+    stream = data if hasattr(data, "read") else io.BytesIO(data)
+    # Long pages are split into several pieces; 'start_index' records where each piece starts in its page
+    return RecursiveCharacterTextSplitter(add_start_index=True).split_documents(iter_pdf_pages(file_name, stream))
+
+@st.cache_resource
+def get_parse_pool(max_workers=None):
+    """
+    Return a process pool for PDF parsing, created once per process and worker count.
+
+    Workers are spawned rather than forked because the Streamlit server is multi-threaded.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, page_cache=None, parallel=False, max_workers=None):
+        """
+        :param page_cache: Optional PageCache to use instead of the process-wide one.
+        :param parallel: Parse uploaded files in a process pool instead of one at a time.
+        :param max_workers: Size of the process pool; defaults to the number of CPUs.
+        """
         self.pages = []  # List to keep track of pages from all documents
+        self.page_cache = page_cache if page_cache is not None else get_page_cache()
+        self.parallel = parallel
+        self.max_workers = max_workers
     
     def ingest_documents(self):
         # Step 1: Render a file uploader widget
@@ -18,30 +137,68 @@ class DocumentProcessor:
             accept_multiple_files=True
         )
         
+        # The uploader holds the full set of files on every rerun, so start over from it
+        self.pages = []
         if uploaded_files:
-            for uploaded_file in uploaded_files:
-                # Generate a unique identifier to append to the file's original name
-                unique_id = uuid.uuid4().hex
-                original_name, file_extension = os.path.splitext(uploaded_file.name)
-                temp_file_name = f"{original_name}_{unique_id}{file_extension}"
-                temp_file_path = os.path.join(tempfile.gettempdir(), temp_file_name)
-
-                # Write the uploaded PDF to a temporary file
-                with open(temp_file_path, 'wb') as f:
-                    f.write(uploaded_file.getvalue())
-
-                # Step 2: Process the temporary file
-                loader = PyPDFLoader(temp_file_path)
-                pdf_pages = loader.load_and_split()
-
-                # Step 3: Add the extracted pages to the 'pages' list.
-                self.pages.extend(pdf_pages)
-
-                # Clean up by deleting the temporary file.
-                os.unlink(temp_file_path)
+            self.process_files(uploaded_files)
             
             # Display the total number of pages processed.
             st.write(f"Total pages processed: {len(self.pages)}")
+
+    def process_files(self, uploaded_files):
+        """
+        Parse a batch of uploaded files and add their pages to 'pages', in upload order.
+
+        Files already in the page cache are not parsed again. The remaining files are parsed
+        one at a time, or across a process pool when 'parallel' is set, with per-file progress.
+
+        :param uploaded_files: In-memory binary files with a 'name' attribute, such as Streamlit uploads or io.BytesIO.
+        """
+        # Step 1: Look every file up in the page cache, hashing the upload's buffer without copying it
+        file_pages = [None] * len(uploaded_files)
+        misses = []
+        for position, uploaded_file in enumerate(uploaded_files):
+            with uploaded_file.getbuffer() as buffer:
+                cache_key = PageCache.key_for(buffer)
+            file_pages[position] = self.page_cache.get(cache_key)
+            if file_pages[position] is None:
+                misses.append((position, cache_key, uploaded_file))
+
+        # Step 2: Parse the files that were not cached
+        if misses:
+            progress = st.progress(0.0, text=f"Parsing {len(misses)} PDF file(s)...")
+            for done, (position, cache_key, pdf_pages) in enumerate(self._parse_files(misses), start=1):
+                # Tag every page with the content hash of its file, so downstream indexes can tell documents apart
+                for page in pdf_pages:
+                    page.metadata["doc_hash"] = cache_key
+                file_pages[position] = pdf_pages
+                self.page_cache.put(cache_key, pdf_pages)
+                progress.progress(done / len(misses), text=f"Parsed {uploaded_files[position].name} ({done}/{len(misses)})")
+            progress.empty()
+
+        # Step 3: Add the extracted pages to the 'pages' list, keeping the upload order.
+        for pdf_pages in file_pages:
+            self.pages.extend(pdf_pages)
+
+    def _parse_files(self, misses):
+        """
+        Yield (position, cache_key, pages) for each file as soon as it has been parsed.
+        """
+        if not self.parallel or len(misses) < 2:
+            for position, cache_key, uploaded_file in misses:
+                uploaded_file.seek(0)
+                yield position, cache_key, load_pdf_pages(uploaded_file.name, uploaded_file)
+            return
+
+        # Worker processes need their own copy of the bytes
+        pool = get_parse_pool(self.max_workers)
+        futures = {
+            pool.submit(load_pdf_pages, uploaded_file.name, uploaded_file.getvalue()): (position, cache_key)
+            for position, cache_key, uploaded_file in misses
+        }
+        for future in as_completed(futures):
+            position, cache_key = futures[future]
+            yield position, cache_key, future.result()
         
 if __name__ == "__main__":
     processor = DocumentProcessor()
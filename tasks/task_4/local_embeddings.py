@@ -0,0 +1,68 @@
+import re
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+class HashingEmbeddings(Embeddings):
+    """
+    Local, offline text embeddings built with the hashing trick in NumPy.
+
+    Each lower-cased word and word bigram is hashed with CRC32 into one of 'dimensions' buckets
+    with a hash-derived sign, and the resulting counts are L2-normalized. No model or network
+    access is needed, the output is identical across processes and machines, and a batch is
+    embedded with a single vectorized scatter-add.
+
+    :param dimensions: The length of the produced vectors.
+    :param ngram_range: The smallest and largest word n-gram lengths to hash.
+    """
+
+    _TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, dimensions=768, ngram_range=(1, 2)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    @property
+    def model_name(self) -> str:
+        return f"hashing-{self.dimensions}-{self.ngram_range[0]}{self.ngram_range[1]}"
+
+    def _hashes(self, text):
+        tokens = self._TOKEN_PATTERN.findall(text.lower())
+        low, high = self.ngram_range
+        return [
+            zlib.crc32(" ".join(tokens[start:start + n]).encode("utf-8"))
+            for n in range(low, high + 1)
+            for start in range(len(tokens) - n + 1)
+        ]
+
+    def embed_array(self, texts) -> np.ndarray:
+        """
+        Embed a batch of texts into a float32 matrix with one L2-normalized row per text.
+        """
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            text_hashes = self._hashes(text)
+            hashes.extend(text_hashes)
+            rows.extend([row] * len(text_hashes))
+
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        columns = hashes % self.dimensions
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+
+        flat = np.bincount(
+            np.asarray(rows, dtype=np.int64) * self.dimensions + columns,
+            weights=signs,
+            minlength=len(texts) * self.dimensions
+        )
+        matrix = flat.reshape(len(texts), self.dimensions).astype(np.float32)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
@@ -1,9 +1,100 @@
 import streamlit as st
-from langchain_google_vertexai import VertexAIEmbeddings
+from langchain_core.embeddings import Embeddings
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 
 import sys
 print(sys.executable)
-class EmbeddingClient:
+
+class EmbeddingCache:
+    """
+    Persistent on-disk cache of embedding vectors, stored in SQLite.
+
+    Vectors are keyed by a model key plus the SHA-256 of the text and stored as float32 blobs.
+    Hit and miss counters cover every lookup made since the cache was opened.
+
+    :param path: Location of the SQLite database file; ":memory:" keeps the cache in memory.
+    """
+
+    _LOOKUP_BATCH = 500  # Stay well below SQLite's limit on bound parameters
+
+    def __init__(self, path="embedding_cache.sqlite3"):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_many(self, model, texts) -> list:
+        """
+        Look up the vectors for a list of texts.
+
+        :param model: The model key the vectors were stored under.
+        :param texts: The texts to look up.
+        :return: A list aligned with 'texts' holding each cached vector, or None for a miss.
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), self._LOOKUP_BATCH):
+                batch = hashes[start:start + self._LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                )
+                for text_hash, blob in rows:
+                    found[text_hash] = array('f', blob).tolist()
+
+            vectors = [found.get(text_hash) for text_hash in hashes]
+            hit_count = sum(vector is not None for vector in vectors)
+            self.hits += hit_count
+            self.misses += len(vectors) - hit_count
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        """
+        Store the vectors for a list of texts under a model key.
+        """
+        rows = [
+            (model, self.text_hash(text), array('f', vector).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+@st.cache_resource
+def get_embedding_cache(path="embedding_cache.sqlite3"):
+    """
+    Return the process-wide EmbeddingCache for a database path.
+    """
+    return EmbeddingCache(path)
+
+class EmbeddingClient(Embeddings):
     """
     Task: Initialize the EmbeddingClient class to connect to Google Cloud's VertexAI for text embeddings.
 
@@ -15,15 +106,60 @@ class EmbeddingClient:
     - model_name: A string representing the name of the model to use for embeddings.
     - project: The Google Cloud project ID where the embedding model is hosted.
     - location: The location of the Google Cloud project, such as 'us-central1'.
+    - cache: An optional EmbeddingCache; texts found in it are not sent to the backend again.
+    - batch_size: The most texts sent to the backend in one request.
+    - max_batch_chars: The most characters sent in one request, to stay under the backend's token limit.
+    - max_concurrency: How many batch requests may be in flight at once.
+    - max_retries: How many times a failed batch is retried, split in half each time, before giving up.
+    - backend: Which embedding backend to use: "vertex" (the default), "hashing" for the local
+      offline HashingEmbeddings, or any langchain Embeddings instance.
     """
 
-    def __init__(self, model_name, project, location):
-        # Initialize the VertexAIEmbeddings client with the given parameters
-        self.client = VertexAIEmbeddings(
-            model_name=model_name,
-            project=project,
-            location=location
-        )
+    def __init__(self, model_name, project=None, location=None, cache=None,
+                 batch_size=250, max_batch_chars=60_000, max_concurrency=4, max_retries=3, backend="vertex"):
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self.client = self._create_backend(backend, model_name, project, location)
+        self.cache_namespace = self._cache_namespace(self.client, model_name)
+
+    @staticmethod
+    def _create_backend(backend, model_name, project, location):
+        """
+        Build the embeddings object that requests are sent to.
+        """
+        if isinstance(backend, Embeddings):
+            return backend
+
+        if backend == "vertex":
+            # Imported here so the local backends work without the Vertex AI SDK
+            from langchain_google_vertexai import VertexAIEmbeddings
+
+            # Initialize the VertexAIEmbeddings client with the given parameters
+            return VertexAIEmbeddings(
+                model_name=model_name,
+                project=project,
+                location=location
+            )
+
+        if backend == "hashing":
+            from tasks.task_4.local_embeddings import HashingEmbeddings
+            return HashingEmbeddings()
+
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    @staticmethod
+    def _cache_namespace(client, model_name) -> str:
+        """
+        Name the backend and model that produced a vector, so cached vectors are never served across backends.
+        """
+        if type(client).__name__ == "VertexAIEmbeddings":  # Checked by name, so the SDK is not imported for it
+            return f"vertex:{model_name}"
+        return f"{type(client).__name__}:{getattr(client, 'model_name', model_name)}"
 
     def embed_query(self, query):
         """
@@ -32,7 +168,15 @@ class EmbeddingClient:
         :param query: The text query to embed.
         :return: The embeddings for the query or None if the operation fails.
         """
-        vectors = self.client.embed_query(query)
+        if self.cache is None:
+            return self.client.embed_query(query)
+
+        # Vertex embeds queries and documents with different task types, so they are cached apart
+        model_key = f"{self.cache_namespace}:query"
+        vectors = self.cache.get_many(model_key, [query])[0]
+        if vectors is None:
+            vectors = self.client.embed_query(query)
+            self.cache.put_many(model_key, [query], [vectors])
         return vectors
 
     def embed_documents(self, documents):
@@ -43,11 +187,78 @@ class EmbeddingClient:
         :return: A list of embeddings for the given documents.
         """
         try:
-            return self.client.embed_documents(documents)
+            if self.cache is None:
+                return self._embed_remote(documents)
+            return self._embed_documents_cached(documents)
         except AttributeError:
             st.write("Method embed_documents not defined for the client.")
             return None
 
+    def _embed_documents_cached(self, documents):
+        """
+        Serve cached vectors locally and send only the misses to the backend.
+        """
+        model_key = f"{self.cache_namespace}:document"
+        vectors = self.cache.get_many(model_key, documents)
+
+        # Deduplicate the misses so repeated chunks are only embedded once
+        missing = list(dict.fromkeys(text for text, vector in zip(documents, vectors) if vector is None))
+        if missing:
+            fetched = dict(zip(missing, self._embed_remote(missing)))
+            self.cache.put_many(model_key, missing, [fetched[text] for text in missing])
+            vectors = [fetched[text] if vector is None else vector for text, vector in zip(documents, vectors)]
+
+        return vectors
+
+    def _embed_remote(self, texts):
+        """
+        Embed texts with the backend, in batches sized to its request limits and run concurrently.
+        """
+        batches = self._make_batches(texts)
+        if len(batches) <= 1 or self.max_concurrency <= 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(self._embed_batch, batches))  # map keeps the batch order
+
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def _make_batches(self, texts):
+        """
+        Split texts into consecutive batches bounded by both 'batch_size' and 'max_batch_chars'.
+        """
+        batches = []
+        batch, batch_chars = [], 0
+        for text in texts:
+            if batch and (len(batch) >= self.batch_size or batch_chars + len(text) > self.max_batch_chars):
+                batches.append(batch)
+                batch, batch_chars = [], 0
+            batch.append(text)
+            batch_chars += len(text)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _embed_batch(self, batch, attempt=0):
+        """
+        Embed one batch, retrying it on its own with exponential backoff if the request fails.
+
+        A failed batch is split in half before it is retried, so a batch that is too large for
+        the backend shrinks until it fits.
+        """
+        try:
+            return self.client.embed_documents(batch)
+        except AttributeError:
+            raise
+        except Exception:
+            if attempt >= self.max_retries:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+            if len(batch) == 1:
+                return self._embed_batch(batch, attempt + 1)
+            middle = len(batch) // 2
+            return self._embed_batch(batch[:middle], attempt + 1) + self._embed_batch(batch[middle:], attempt + 1)
+
 def main():
     st.title("VertexAI Embeddings with Streamlit")
     st.write("Enter a query to get embeddings:")
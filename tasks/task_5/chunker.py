@@ -0,0 +1,99 @@
+from collections import deque
+from functools import partial
+
+from langchain_core.documents import Document
+
+def iter_pieces(text, separator):
+    """
+    Yield the (start, end) offsets of the non-empty pieces of text between separators.
+    """
+    start = 0
+    while start <= len(text):
+        end = text.find(separator, start)
+        if end == -1:
+            end = len(text)
+        if end > start:
+            yield start, end
+        start = end + len(separator)
+
+def strip_span(text, start, end):
+    """
+    Narrow a span so it neither starts nor ends with whitespace.
+    """
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def iter_spans(text, separator="\n", chunk_size=500, chunk_overlap=100):
+    """
+    Yield the (start, end) offsets of the chunks of a text.
+
+    Pieces between separators are merged greedily into chunks of at most 'chunk_size' characters,
+    and each chunk starts with up to 'chunk_overlap' characters of the previous one, the same
+    merge rule as CharacterTextSplitter. Only offsets are produced, so no intermediate strings are built.
+    """
+    window = deque()  # (start, end) of the pieces in the current chunk
+    for start, end in iter_pieces(text, separator):
+        if window and end - window[0][0] > chunk_size:
+            span = strip_span(text, window[0][0], window[-1][1])
+            if span[1] > span[0]:
+                yield span
+            # Keep a tail of the previous chunk as overlap, as long as the new piece still fits
+            while window and (window[-1][1] - window[0][0] > chunk_overlap or end - window[0][0] > chunk_size):
+                window.popleft()
+        window.append((start, end))
+
+    if window:
+        span = strip_span(text, window[0][0], window[-1][1])
+        if span[1] > span[0]:
+            yield span
+
+class StreamingChunker:
+    """
+    Split pages into chunks lazily, keeping the page metadata and each chunk's character offsets.
+
+    Every chunk is a Document carrying the metadata of its page (source, page, doc_hash) plus
+    'start_index' and 'end_index' into the text of the whole PDF page. When a page arrives split
+    into several pieces, each piece's own 'start_index' within the page is added to its offsets. With 'max_workers' above 1 the chunk offsets
+    are computed in the shared process pool and the chunks are still yielded in page order.
+
+    :param separator: The string pages are split on.
+    :param chunk_size: The largest chunk, in characters.
+    :param chunk_overlap: How many characters of the previous chunk a chunk may repeat.
+    :param max_workers: Number of worker processes; chunking runs in-process when None or 1.
+    """
+
+    def __init__(self, separator="\n", chunk_size=500, chunk_overlap=100, max_workers=None):
+        self.separator = separator
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.max_workers = max_workers
+
+    def iter_chunks(self, pages):
+        """
+        Yield one Document per chunk of the given pages, in page order.
+        """
+        if self.max_workers and self.max_workers > 1:
+            from tasks.task_3.task_3 import get_parse_pool
+
+            pages = list(pages)
+            spans_fn = partial(_page_spans, separator=self.separator, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+            pool = get_parse_pool(self.max_workers)
+            all_spans = pool.map(spans_fn, (page.page_content for page in pages), chunksize=32)
+        else:
+            all_spans = (iter_spans(page.page_content, self.separator, self.chunk_size, self.chunk_overlap) for page in pages)
+
+        for page, spans in zip(pages, all_spans):
+            text = page.page_content
+            offset = page.metadata.get("start_index", 0)  # Where this piece starts in its PDF page
+            for start, end in spans:
+                yield Document(
+                    page_content=text[start:end],
+                    metadata={**page.metadata, "start_index": offset + start, "end_index": offset + end}
+                )
+
+def _page_spans(text, separator, chunk_size, chunk_overlap):
+    # Module-level so it can be shipped to worker processes
+    return list(iter_spans(text, separator, chunk_size, chunk_overlap))
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store holding every embedding in one contiguous float32 matrix.
+
+    Rows are L2-normalized when they are added, so cosine similarity is a single matrix product,
+    and the top k rows are picked with argpartition instead of a full sort. Several queries are
+    scored together with one BLAS call through similarity_search_batch. The store supports
+    append and delete by ID, and can be saved to a directory and reopened as a memory map.
+
+    It implements the surface ChromaCollectionCreator and QuizGenerator use from Chroma
+    (similarity_search, similarity_search_with_relevance_scores, add_documents, get, delete).
+
+    :param embedding: The embeddings object used for documents and queries.
+    """
+
+    def __init__(self, embedding):
+        self._embedding = embedding
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._size = 0  # Rows in use; the matrix keeps spare capacity for appends
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._positions = {}  # id -> row
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        matrix = np.array(vectors, dtype=np.float32)  # Always a copy, so the caller's vectors are left untouched
+        if matrix.ndim == 1:
+            matrix = matrix[np.newaxis, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def _reserve(self, rows, dimensions):
+        """
+        Make room for 'rows' more rows, doubling the capacity so appends are amortized O(1).
+        """
+        needed = self._size + rows
+        if self._matrix.shape[1] != dimensions and self._size == 0:
+            self._matrix = np.empty((0, dimensions), dtype=np.float32)
+        if needed > self._matrix.shape[0]:
+            grown = np.empty((max(needed, 2 * self._matrix.shape[0], 64), dimensions), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in texts]
+
+        vectors = self._normalize(self._embedding.embed_documents(texts))
+        with self._lock:
+            duplicates = [chunk_id for chunk_id in ids if chunk_id in self._positions]
+            if duplicates:
+                self.delete(duplicates)  # Adding an existing ID replaces it
+            self._reserve(len(texts), vectors.shape[1])
+            self._matrix[self._size:self._size + len(texts)] = vectors
+            for offset, chunk_id in enumerate(ids):
+                self._positions[chunk_id] = self._size + offset
+            self._size += len(texts)
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(dict(metadata or {}) for metadata in metadatas)
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        """
+        Remove rows by ID, compacting the matrix so it stays contiguous.
+        """
+        with self._lock:
+            remove = {self._positions[chunk_id] for chunk_id in ids or [] if chunk_id in self._positions}
+            if not remove:
+                return False
+            keep = np.array([row for row in range(self._size) if row not in remove], dtype=np.int64)
+            self._matrix = np.ascontiguousarray(self._matrix[keep])
+            self._ids = [self._ids[row] for row in keep]
+            self._texts = [self._texts[row] for row in keep]
+            self._metadatas = [self._metadatas[row] for row in keep]
+            self._positions = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._size = len(keep)
+        return True
+
+    def get(self, ids=None, include=None, **kwargs) -> dict:
+        """
+        Return stored entries in the same shape as Chroma's get.
+        """
+        include = include if include is not None else ["documents", "metadatas"]
+        with self._lock:
+            rows = range(self._size) if ids is None else [self._positions[i] for i in ids if i in self._positions]
+            result = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self._texts[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[row] for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = self._matrix[list(rows)]
+        return result
+
+    def _top_k(self, query_matrix, k):
+        """
+        Score a batch of normalized queries against every row and return (rows, scores) per query.
+        Callers hold the lock until they have turned the rows into documents.
+        """
+        if self._size == 0:
+            return [([], np.empty(0, dtype=np.float32)) for _ in query_matrix]
+        scores = query_matrix @ self._matrix[:self._size].T  # One BLAS call for the whole batch
+        k = max(1, min(k, self._size))
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for query_scores, rows in zip(scores, candidates):
+            rows = rows[np.argsort(-query_scores[rows])]
+            results.append((rows, query_scores[rows]))
+        return results
+
+    def _documents(self, rows):
+        return [Document(page_content=self._texts[row], metadata=dict(self._metadatas[row])) for row in rows]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        with self._lock:
+            rows, _ = self._top_k(self._normalize(embedding), k)[0]
+            return self._documents(rows)
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        query_matrix = self._normalize(self._embedding.embed_query(query))
+        with self._lock:
+            rows, scores = self._top_k(query_matrix, k)[0]
+            return list(zip(self._documents(rows), scores.tolist()))
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def _similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        # Cosine similarity of normalized vectors, mapped from [-1, 1] to [0, 1]
+        return [(document, (score + 1) / 2) for document, score in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_batch(self, queries, k=4):
+        """
+        Search for several queries at once, scoring all of them in a single matrix product.
+
+        :return: One list of Documents per query, in query order.
+        """
+        query_matrix = self._normalize([self._embedding.embed_query(query) for query in queries])
+        with self._lock:
+            return [self._documents(rows) for rows, _ in self._top_k(query_matrix, k)]
+
+    def save(self, directory):
+        """
+        Write the matrix and the entries to a directory so it can be reopened with load.
+
+        Both files are written in full to temporary files first and then moved into place,
+        so a crash while saving leaves the previous save intact.
+        """
+        os.makedirs(directory, exist_ok=True)
+        vectors_path = os.path.join(directory, "vectors.npy")
+        entries_path = os.path.join(directory, "entries.json")
+        with self._lock:
+            with open(vectors_path + ".tmp", "wb") as f:
+                np.save(f, self._matrix[:self._size])
+                f.flush()
+                os.fsync(f.fileno())
+            with open(entries_path + ".tmp", "w") as f:
+                json.dump({"ids": self._ids, "texts": self._texts, "metadatas": self._metadatas}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(vectors_path + ".tmp", vectors_path)
+            os.replace(entries_path + ".tmp", entries_path)
+
+    @classmethod
+    def load(cls, directory, embedding, mmap=True):
+        """
+        Reopen a saved store. With 'mmap' the matrix is memory-mapped copy-on-write instead of read into memory.
+        """
+        store = cls(embedding)
+        store._matrix = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="c" if mmap else None)
+        with open(os.path.join(directory, "entries.json")) as f:
+            entries = json.load(f)
+        store._ids, store._texts, store._metadatas = entries["ids"], entries["texts"], entries["metadatas"]
+        if len(store._ids) != store._matrix.shape[0]:
+            raise ValueError(f"The saved store in {directory} is inconsistent: "
+                             f"{store._matrix.shape[0]} vectors for {len(store._ids)} entries.")
+        store._positions = {chunk_id: row for row, chunk_id in enumerate(store._ids)}
+        store._size = len(store._ids)
+        return store
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
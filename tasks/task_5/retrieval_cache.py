@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+def normalize_topic(topic) -> str:
+    """
+    Normalize a topic string so trivially different spellings share cache entries.
+    """
+    return " ".join(str(topic).lower().split())
+
+class RetrievalCache:
+    """
+    LRU cache of vector store search results with a time-to-live.
+
+    Keys include the version of the collection that was searched, so results computed before
+    the collection changed are never served again and simply age out of the cache.
+
+    :param max_entries: The most results kept before the least recently used one is evicted.
+    :param ttl: Seconds a result stays valid; None keeps results until they are evicted.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, results), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, key, results):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, tuple(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+@st.cache_resource
+def get_retrieval_cache():
+    """
+    Return the process-wide RetrievalCache shared across reruns and sessions.
+    """
+    return RetrievalCache()
+
+class CachedVectorStore:
+    """
+    Wrap a vector store so repeated searches for the same topic are served from a RetrievalCache.
+
+    Results are keyed by the store's identity and version, the normalized query, k and the search
+    method. Searches with extra arguments such as filters are passed through uncached. Any other
+    attribute is delegated to the wrapped store.
+
+    :param store: The vector store to wrap, such as a Chroma collection.
+    :param store_key: A string identifying the store, e.g. its collection name and directory.
+    :param version_fn: A callable returning the store's current version, or None if it must not be cached.
+    :param cache: The RetrievalCache to use.
+    """
+
+    def __init__(self, store, store_key, version_fn, cache):
+        self.store = store
+        self.store_key = store_key
+        self.version_fn = version_fn
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self._cached("similarity_search", query, k, kwargs)
+
+    def similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        return self._cached("similarity_search_with_relevance_scores", query, k, kwargs)
+
+    def _cached(self, method, query, k, kwargs):
+        search = getattr(self.store, method)
+        version = self.version_fn()
+        if kwargs or version is None:
+            return search(query, k=k, **kwargs)
+
+        key = (self.store_key, version, method, normalize_topic(query), k)
+        results = self.cache.get(key)
+        if results is None:
+            results = search(query, k=k)
+            self.cache.put(key, results)
+        return results
@@ -1,71 +1,201 @@
 import sys
 import os
+import hashlib
+from collections import defaultdict
 import streamlit as st
 sys.path.append(os.path.abspath('../../'))
 from tasks.task_3.task_3 import DocumentProcessor
 from tasks.task_4.task_4 import EmbeddingClient
+from tasks.task_5.chunker import StreamingChunker
+from tasks.task_5.retrieval_cache import CachedVectorStore, get_retrieval_cache
+from tasks.task_5.numpy_store import NumpyVectorStore
 
 # Import Task libraries
 from langchain_core.documents import Document
-from langchain.text_splitter import CharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 
 class ChromaCollectionCreator:
-    def __init__(self, processor, embed_model):
+    def __init__(self, processor, embed_model, persist_directory=None, collection_name="quizzify", chunk_workers=None,
+                 vector_store="chroma", db=None, owner=None):
         """
         Initializes the ChromaCollectionCreator with a DocumentProcessor instance and embeddings configuration.
         :param processor: An instance of DocumentProcessor that has processed documents.
         :param embed_model: An embedding client for embedding documents.
+        :param persist_directory: Optional directory where the Chroma collection is stored; in memory if None.
+        :param collection_name: The name of the Chroma collection.
+        :param chunk_workers: Number of processes to chunk pages with; chunking runs in-process when None.
+        :param vector_store: "chroma", or "numpy" for the in-process NumpyVectorStore, which has less
+                             per-query overhead on small and medium corpora.
+        :param db: An already opened vector store (see open_store) to update instead of opening a new one.
+        :param owner: Tag stored with every chunk this creator adds; only chunks carrying it are ever removed.
+                      Defaults to the collection name, so the collection is one library. Creators that share
+                      a collection need distinct owners.
         """
         self.processor = processor      # This will hold the DocumentProcessor from Task 3
         self.embed_model = embed_model  # This will hold the EmbeddingClient from Task 4
-        self.db = None                  # This will hold the Chroma collection
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.chunk_workers = chunk_workers
+        self.vector_store = vector_store
+        self.db = db                    # This will hold the Chroma collection
+        self.version = None             # Fingerprint of the chunk IDs in the collection, set once it is built
+        self.owner = owner or collection_name
     
     def create_chroma_collection(self):
         """
-        Create a Chroma collection from the documents processed by the DocumentProcessor instance.
+        Create or update a Chroma collection from the documents processed by the DocumentProcessor instance.
 
         Steps:
         1. Check if any documents have been processed by the DocumentProcessor instance. If not, display an error message using Streamlit's error widget.
-        2. Split the processed documents into text chunks suitable for embedding and indexing using CharacterTextSplitter.
-        3. Create a Chroma collection in memory with the text chunks obtained from step 2 and the embeddings model initialized in the class.
+        2. Open the Chroma collection and find which documents it already holds.
+        3. Split only the documents that are not indexed yet into text chunks using StreamingChunker.
+        4. Add the new chunks under stable IDs derived from their content, and delete the chunks of documents that are
+           tagged with this creator's owner and are no longer processed. Chunks of other owners are left alone.
         """
         # Step 1: Check for processed documents
         if not self.processor.pages:
             st.error("No documents found!", icon="🚨")
             return
 
-        # Step 2: Split documents into text chunks
-        texts = []
-        splitter = CharacterTextSplitter(
-            separator="\n",  # Using newline as a separator
-            chunk_size=500,  # Define chunk size (e.g., 500 characters)
-            chunk_overlap=100  # Define chunk overlap (e.g., 100 characters)
-        )
+        # Step 2: Open the collection and group this owner's chunk IDs by document
+        try:
+            if self.db is None:
+                self.db = self.open_store()
+            indexed = self.db.get(include=["metadatas"])
+        except Exception as e:
+            st.error(f"Failed to open Chroma Collection! Error: {str(e)}", icon="🚨")
+            return
+
+        indexed_ids = defaultdict(list)
+        for chunk_id, metadata in zip(indexed["ids"], indexed["metadatas"]):
+            metadata = metadata or {}
+            # Chunks indexed before owners were recorded belong to the collection's own library
+            if metadata.get("owner", self.collection_name) == self.owner:
+                indexed_ids[metadata.get("doc_hash")].append(chunk_id)
+        owned_ids = [chunk_id for chunk_ids in indexed_ids.values() for chunk_id in chunk_ids]
 
+        # Step 3: Split the pages of documents that are not indexed yet
+        current_docs = set()
+        pending_pages = []
         for page in self.processor.pages:
             # Use 'page_content' to get the document text
             document_text = getattr(page, 'page_content', '')
             if not document_text:
                 st.error("Unable to access document content!", icon="🚨")
                 return
-            # Create Document objects from text chunks
-            chunks = splitter.split_text(document_text)
-            for chunk in chunks:
-                texts.append(Document(page_content=chunk))
 
-        if texts:
-            st.success(f"Successfully split pages into {len(texts)} chunks!", icon="✅")
-        else:
-            st.error("Failed to split pages into chunks!", icon="🚨")
+            doc_hash = self._document_hash(page)
+            current_docs.add(doc_hash)
+            if doc_hash not in indexed_ids:
+                page.metadata.setdefault("doc_hash", doc_hash)
+                pending_pages.append(page)
+
+        chunker = StreamingChunker(
+            separator="\n",  # Using newline as a separator
+            chunk_size=500,  # Define chunk size (e.g., 500 characters)
+            chunk_overlap=100,  # Define chunk overlap (e.g., 100 characters)
+            max_workers=self.chunk_workers
+        )
+
+        # Chunks keep their source, page and offsets, so they can be filtered and invalidated per document
+        texts, ids = [], []
+        for chunk in chunker.iter_chunks(pending_pages):
+            chunk.metadata["owner"] = self.owner
+            chunk.metadata["chunk_id"] = self._chunk_id(chunk)  # Lets searches look up the stored vector of a result
+            texts.append(chunk)
+            ids.append(chunk.metadata["chunk_id"])
+
+        # The owner's documents that are no longer processed were removed; read from the store, so this holds across runs
+        stale_ids = [
+            chunk_id
+            for doc_hash, chunk_ids in indexed_ids.items() if doc_hash not in current_docs
+            for chunk_id in chunk_ids
+        ]
+
+        if not texts and not stale_ids:
+            self.version = self._fingerprint(owned_ids)
+            st.success("Chroma Collection is up to date!", icon="✅")
             return
+        if texts:
+            st.success(f"Successfully split new pages into {len(texts)} chunks!", icon="✅")
 
-        # Step 3: Create the Chroma Collection
+        # Step 4: Upsert the new chunks and drop the removed documents
         try:
-            self.db = Chroma.from_documents(texts, self.embed_model.client)
-            st.success("Successfully created Chroma Collection!", icon="✅")
+            if stale_ids:
+                self.db.delete(ids=stale_ids)
+            if texts:
+                # Duplicate pages within an upload produce the same ID; Chroma rejects repeats
+                unique = dict(zip(ids, texts))
+                self.db.add_documents(list(unique.values()), ids=list(unique.keys()))
+            if isinstance(self.db, NumpyVectorStore) and self.persist_directory:
+                self.db.save(os.path.join(self.persist_directory, self.collection_name))
+            stale = set(stale_ids)
+            self.version = self._fingerprint([chunk_id for chunk_id in owned_ids if chunk_id not in stale] + ids)
+            st.success(f"Successfully updated Chroma Collection! Added {len(texts)} chunks, removed {len(stale_ids)}.", icon="✅")
         except Exception as e:
-            st.error(f"Failed to create Chroma Collection! Error: {str(e)}", icon="🚨")
+            self.version = None  # The collection may be partially updated, so stop caching searches on it
+            st.error(f"Failed to update Chroma Collection! Error: {str(e)}", icon="🚨")
+
+    def open_store(self):
+        """
+        Open the configured vector store, reloading it from 'persist_directory' when one is set.
+        """
+        if self.vector_store == "numpy":
+            saved = os.path.join(self.persist_directory, self.collection_name) if self.persist_directory else None
+            if saved and os.path.exists(os.path.join(saved, "vectors.npy")):
+                return NumpyVectorStore.load(saved, self.embed_model)
+            return NumpyVectorStore(self.embed_model)
+
+        if self.vector_store == "chroma":
+            return Chroma(
+                collection_name=self.collection_name,
+                embedding_function=self.embed_model,
+                persist_directory=self.persist_directory
+            )
+
+        raise ValueError(f"Unknown vector store: {self.vector_store}")
+
+    def get_vectorstore(self):
+        """
+        Return the collection wrapped in a retrieval cache, or None if it has not been created.
+
+        Cached results are keyed by the collection version, so they are invalidated whenever
+        create_chroma_collection changes the collection.
+        """
+        if self.db is None:
+            return None
+        store_key = f"{self.persist_directory}:{self.collection_name}"
+        return CachedVectorStore(self.db, store_key, lambda: self.version, get_retrieval_cache())
+
+    @staticmethod
+    def _fingerprint(chunk_ids) -> str:
+        """
+        Hash a set of chunk IDs into a collection version.
+        """
+        digest = hashlib.sha256()
+        for chunk_id in sorted(set(chunk_ids)):
+            digest.update(chunk_id.encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def _document_hash(page) -> str:
+        """
+        Identify the document a page belongs to, by content hash when the processor recorded one.
+        """
+        doc_hash = page.metadata.get("doc_hash")
+        if doc_hash:
+            return doc_hash
+        return hashlib.sha256(str(page.metadata.get("source", "")).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _chunk_id(chunk) -> str:
+        """
+        Derive a stable chunk ID from the owner, the document hash, the chunk's place in it and its text.
+        """
+        metadata = chunk.metadata
+        key = f"{metadata['owner']}:{metadata.get('page')}:{metadata['start_index']}:{chunk.page_content}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return f"{metadata['doc_hash'][:16]}-{digest[:24]}"
     
     def query_chroma_collection(self, query) -> Document:
         """
@@ -74,7 +204,7 @@ class ChromaCollectionCreator:
         :return: The first matching document from the collection with similarity score.
         """
         if self.db:
-            docs = self.db.similarity_search_with_relevance_scores(query)
+            docs = self.get_vectorstore().similarity_search_with_relevance_scores(query)
             if docs:
                 return docs[0]
             else:
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.caches import BaseCache
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.language_models.llms import LLM
+
+# Errors a failed LLM call raises; Vertex AI raises Google API errors, e.g. ResourceExhausted on quota
+try:
+    from google.api_core.exceptions import GoogleAPICallError, RetryError
+    LLM_CALL_ERRORS = (ValueError, ConnectionError, TimeoutError, GoogleAPICallError, RetryError)
+except ImportError:
+    LLM_CALL_ERRORS = (ValueError, ConnectionError, TimeoutError)
+
+# Defaults of the VertexAI model the quiz generators have always used
+VERTEX_DEFAULTS = {"model_name": "gemini-pro", "temperature": 0.7, "max_output_tokens": 400}
+
+_BATCH_COUNT = re.compile(r"create (\d+) different quiz questions")
+_SENTENCE = re.compile(r"[^.!?\n]{30,200}[.!?]")
+_WORD = re.compile(r"[A-Za-z]{5,}")
+
+class LLMCallError(ValueError):
+    """
+    Raised when a call to the LLM backend fails, e.g. on a network, quota or server error. The call may succeed if retried.
+    """
+
+class ValidatingCache(BaseCache):
+    """
+    Wrap a langchain BaseCache so that only responses accepted by 'validate' are stored.
+
+    A cached response is served for every later call with the same prompt, so caching a malformed
+    response would make every retry of that prompt fail the same way.
+
+    :param cache: The BaseCache to store accepted responses in.
+    :param validate: A callable that takes a response text and returns whether it may be cached.
+    """
+
+    def __init__(self, cache, validate):
+        self.cache = cache
+        self.validate = validate
+
+    def lookup(self, prompt, llm_string):
+        return self.cache.lookup(prompt, llm_string)
+
+    def update(self, prompt, llm_string, return_val):
+        if all(self.validate(generation.text) for generation in return_val):
+            self.cache.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs):
+        self.cache.clear(**kwargs)
+
+def create_llm(backend="vertex", cache=None, cache_filter=None, **kwargs):
+    """
+    Create the LLM used for quiz generation.
+
+    :param backend: "vertex" for VertexAI, "fake" for the deterministic FakeQuizLLM, or any langchain language model.
+    :param cache: An optional langchain BaseCache (e.g. InMemoryCache or SQLiteCache) that serves repeated prompts
+                  without calling the backend. Identical prompts then always get identical responses, so a
+                  malformed response is served again on retry unless 'cache_filter' rejects it.
+    :param cache_filter: An optional callable that takes a response text; only responses it accepts are cached.
+    :param kwargs: Settings for the backend, overriding its defaults.
+    """
+    if isinstance(backend, BaseLanguageModel):
+        llm = backend
+    elif backend == "vertex":
+        from langchain_google_vertexai import VertexAI
+        llm = VertexAI(**{**VERTEX_DEFAULTS, **kwargs})
+    elif backend == "fake":
+        llm = FakeQuizLLM(**kwargs)
+    else:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+
+    if cache is not None:
+        llm.cache = ValidatingCache(cache, cache_filter) if cache_filter is not None else cache
+    return llm
+
+class FakeQuizLLM(LLM):
+    """
+    Deterministic local stand-in for the quiz LLM, for load tests and profiling without network access.
+
+    It answers quiz prompts with schema-valid questions built from sentences of the prompt's context,
+    as one JSON object or, for batch prompts, a JSON array of the requested size. The response depends
+    only on the prompt, 'seed' and the attempt number the caller passes as metadata={"attempt": n}, so a
+    run is reproducible, even with concurrent calls, while a retried prompt gets a fresh draw. Latency
+    and failures are injected to exercise the generation pipeline.
+
+    :param latency: Seconds every call takes.
+    :param latency_jitter: Up to this many extra seconds, drawn per call, to produce a latency tail.
+    :param failure_rate: Share of calls that raise ValueError, as a failed API call would.
+    :param malformed_rate: Share of calls that return truncated, undecodable JSON.
+    :param seed: Seed mixed into every response.
+    """
+
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    failure_rate: float = 0.0
+    malformed_rate: float = 0.0
+    seed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-quiz"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"seed": self.seed, "failure_rate": self.failure_rate, "malformed_rate": self.malformed_rate}
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        prompt_digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        attempt = (getattr(run_manager, "metadata", None) or {}).get("attempt", 0)
+        rng = random.Random(hashlib.sha256(f"{self.seed}:{attempt}:".encode("utf-8") + prompt_digest).digest())
+
+        time.sleep(self.latency + rng.uniform(0, self.latency_jitter))
+        if rng.random() < self.failure_rate:
+            raise ValueError("Injected LLM failure.")
+
+        context = prompt.rsplit("Context:", 1)[-1]
+        batch = _BATCH_COUNT.search(prompt)
+        if batch:
+            response = json.dumps([self._question(context, rng) for _ in range(int(batch.group(1)))], indent=2)
+        else:
+            response = json.dumps(self._question(context, rng), indent=2)
+
+        if rng.random() < self.malformed_rate:
+            return response[:len(response) // 2]
+        return f"```json\n{response}\n```"
+
+    @staticmethod
+    def _question(context, rng) -> dict:
+        """
+        Build a fill-in-the-blank question from a sentence of the context, with other context words as distractors.
+        """
+        sentences = _SENTENCE.findall(context) or [context.strip()[:200] or "The material covers this topic."]
+        sentence = rng.choice(sentences).strip()
+        words = _WORD.findall(sentence) or ["material"]
+        answer = rng.choice(words)
+
+        pool = sorted(set(_WORD.findall(context)) - {answer}) or ["option"]
+        distractors = [rng.choice(pool) + ("" if len(pool) >= 3 else str(index)) for index in range(3)]
+        while len(set(distractors)) < 3:
+            distractors = [f"{word}{index}" for index, word in enumerate(distractors)]
+
+        values = distractors + [answer]
+        rng.shuffle(values)
+        keys = ["A", "B", "C", "D"]
+        return {
+            "question": f"Which word completes this statement: \"{sentence.replace(answer, '_____', 1)}\"",
+            "choices": [{"key": key, "value": value} for key, value in zip(keys, values)],
+            "answer": keys[values.index(answer)],
+            "explanation": f"The material states: \"{sentence}\""
+        }
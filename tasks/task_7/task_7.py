@@ -1,9 +1,9 @@
 import streamlit as st
-from langchain_google_vertexai import VertexAI
 from langchain_core.prompts import PromptTemplate
 import os
 import sys
 sys.path.append(os.path.abspath('../../'))
+from tasks.task_7.llm_backends import create_llm
 
 class QuizGenerator:
     def __init__(self, topic=None, num_questions=1, vectorstore=None):
@@ -51,15 +51,15 @@ class QuizGenerator:
         Context: {context}
         """
     
-    def init_llm(self):
+    def init_llm(self, backend="vertex", cache=None, **llm_kwargs):
         """
         Initialize the Large Language Model (LLM) for quiz question generation.
+
+        :param backend: "vertex" (gemini-pro), "fake" for the deterministic local FakeQuizLLM, or a langchain language model.
+        :param cache: An optional langchain BaseCache for responses.
+        :param llm_kwargs: Backend settings, e.g. temperature for Vertex or latency for the fake.
         """
-        self.llm = VertexAI(
-            model_name="gemini-pro",
-            temperature=0.7,  # Example value; adjust as needed
-            max_output_tokens=400  # Example value within recommended range
-        )
+        self.llm = create_llm(backend, cache=cache, **llm_kwargs)
         
     def generate_question_with_vectorstore(self):
         """
@@ -0,0 +1,43 @@
+import numpy as np
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+def select_context_slices(query_vector, candidate_vectors, num_slices, slice_size=4, lambda_mult=0.5, reuse_penalty=0.5) -> list:
+    """
+    Pick a different, diverse slice of candidate chunks for each question with maximal marginal relevance.
+
+    Within a slice, each pick maximizes 'lambda_mult' times its similarity to the query minus
+    (1 - 'lambda_mult') times its highest similarity to the chunks already in the slice. Across
+    slices, every earlier use of a chunk costs 'reuse_penalty', so later slices lead with chunks
+    the earlier ones did not cover.
+
+    :param query_vector: The embedding of the quiz topic.
+    :param candidate_vectors: The embeddings of the retrieved candidate chunks.
+    :param num_slices: How many slices to build, usually one per question.
+    :param slice_size: How many chunks go into each slice.
+    :return: A list of 'num_slices' lists of candidate indices, most relevant first.
+    """
+    candidates = _normalize(candidate_vectors)
+    if len(candidates) == 0:
+        return [[] for _ in range(num_slices)]
+
+    relevance = candidates @ _normalize(query_vector)
+    similarity = candidates @ candidates.T
+    usage = np.zeros(len(candidates), dtype=np.float32)
+
+    slices = []
+    for _ in range(num_slices):
+        chosen = []
+        redundancy = np.full(len(candidates), -1.0, dtype=np.float32)
+        for _ in range(min(slice_size, len(candidates))):
+            scores = lambda_mult * relevance - (1 - lambda_mult) * np.maximum(redundancy, 0) - reuse_penalty * usage
+            scores[chosen] = -np.inf
+            best = int(np.argmax(scores))
+            chosen.append(best)
+            redundancy = np.maximum(redundancy, similarity[:, best])
+        usage[chosen] += 1
+        slices.append(chosen)
+    return slices
@@ -0,0 +1,111 @@
+import re
+import threading
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_WORD_PATTERN = re.compile(r"\w+")
+
+def normalize_text(text) -> str:
+    """
+    Lower-case a text and reduce it to its words, so punctuation and spacing do not matter.
+    """
+    return " ".join(_WORD_PATTERN.findall(str(text).lower()))
+
+def _choose_bands(num_perm, threshold):
+    """
+    Pick the number of LSH bands whose collision curve (1/bands)^(1/rows) is closest to the threshold.
+    """
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+class MinHashLSHIndex:
+    """
+    Near-duplicate index over short texts, using MinHash signatures and locality-sensitive hashing.
+
+    Texts are normalized and cut into overlapping word shingles, so rewordings that keep most of
+    the wording and word order are caught as well as exact repeats, while short questions that
+    differ in their key word (France / Germany) are not. A lookup only compares the text
+    against the items that share an LSH band with it, so its cost does not grow with the size
+    of the index. Candidates are confirmed with the Jaccard similarity estimated from signatures.
+
+    :param threshold: The estimated Jaccard similarity at or above which two texts are duplicates.
+    :param num_perm: The MinHash signature length; longer signatures estimate similarity more precisely.
+    :param shingle_size: The length in words of the shingles.
+    :param seed: Seed for the hash permutations, so signatures are comparable across indexes.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, shingle_size=2, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures = []  # Item number -> signature
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def signature(self, text) -> np.ndarray:
+        words = normalize_text(text).split()
+        size = self.shingle_size
+        shingles = {" ".join(words[start:start + size]) for start in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        # One universal hash per permutation, applied to every shingle at once; overflow wraps as intended
+        permuted = (self._a[:, np.newaxis] * hashes[np.newaxis, :] + self._b[:, np.newaxis]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _best_match(self, signature, keys):
+        candidates = {item for band, key in enumerate(keys) for item in self._buckets[band].get(key, ())}
+        best = 0.0
+        for item in candidates:
+            best = max(best, float(np.mean(self._signatures[item] == signature)))
+        return best
+
+    def similarity(self, text) -> float:
+        """
+        Return the highest estimated similarity between a text and the indexed texts it collides with.
+        """
+        signature = self.signature(text)
+        with self._lock:
+            return self._best_match(signature, self._band_keys(signature))
+
+    def is_duplicate(self, text) -> bool:
+        return self.similarity(text) >= self.threshold
+
+    def add(self, text):
+        signature = self.signature(text)
+        with self._lock:
+            self._insert(signature, self._band_keys(signature))
+
+    def add_if_unique(self, text) -> bool:
+        """
+        Add a text unless it is a near duplicate of one already indexed, as one atomic step.
+
+        Returns:
+        - True if the text was added, False if it was a duplicate.
+        """
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        with self._lock:
+            if self._best_match(signature, keys) >= self.threshold:
+                return False
+            self._insert(signature, keys)
+            return True
+
+    def _insert(self, signature, keys):
+        item = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band][key].append(item)
@@ -0,0 +1,260 @@
+import json
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Matches a whole string literal (left untouched), a string in curly quotes, a trailing comma, or a bare Python literal
+_REPAIRABLE = re.compile(r'"(?:\\.|[^"\\])*"|[“”](?:\\.|[^“”"\\])*[“”]|,\s*(?=[}\]])|\b(?:True|False|None)\b')
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# What may follow the opener of a JSON object or array, so braces in prose are not taken for JSON
+_VALUE_START = {"{": '"“}', "[": '{["“]-0123456789tfn'}
+
+def _repair_token(match):
+    token = match.group(0)
+    if token.startswith('"'):
+        return token
+    if token[0] in "“”":
+        return f'"{token[1:-1]}"'
+    if token.startswith(","):
+        return ""
+    return _PYTHON_LITERALS[token]
+
+def _span_end(text, start):
+    """
+    Return the offset just past the bracket that closes the one at 'start', or None if the text ends first.
+    """
+    depth, in_string, escaped = 0, False, False
+    for position in range(start, len(text)):
+        char = text[position]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return position + 1
+    return None
+
+def iter_json_spans(text, opener="{"):
+    """
+    Yield the (start, end) offsets of every top-level JSON object (or array, with opener="[") in a text, in order.
+
+    Brackets inside string literals are ignored, so code fences, prose before or after the
+    JSON, and braces inside question text do not confuse the scan. Values nested in a span are
+    not yielded separately. A value that is cut off, as in a truncated response, ends the scan,
+    so the complete objects inside it, such as its choices, are never taken for answers.
+    """
+    closer = "}" if opener == "{" else "]"
+    start = text.find(opener)
+    while start != -1:
+        following = text[start + 1:].lstrip()[:1]
+        if following and following not in _VALUE_START[opener]:
+            start = text.find(opener, start + 1)  # A bracket in prose
+            continue
+        end = _span_end(text, start)
+        if end is None:
+            return
+        if text[end - 1] == closer:
+            yield start, end
+        start = text.find(opener, end)
+
+def find_json_span(text, opener="{"):
+    """
+    Return the first balanced JSON object (or array, with opener="[") in a text, or None.
+    """
+    for start, end in iter_json_spans(text, opener):
+        return text[start:end]
+    return None
+
+def repair_json(text) -> str:
+    """
+    Fix the defects LLMs most often put in JSON: strings in curly quotes, trailing commas and Python literals.
+
+    Only the text outside string literals is changed, so curly quotes inside a question or explanation are kept.
+    """
+    return _REPAIRABLE.sub(_repair_token, text)
+
+def _decode(span):
+    try:
+        return json.loads(span), False
+    except json.JSONDecodeError:
+        pass
+    return json.loads(repair_json(span)), True
+
+def iter_json_values(text, opener="{"):
+    """
+    Decode every top-level JSON object (or array) in a text, in order, repairing the ones that do not decode as is.
+
+    Spans that cannot be decoded even after repair are skipped.
+
+    :return: An iterator of (value, repaired) pairs.
+    """
+    for start, end in iter_json_spans(text, opener):
+        try:
+            yield _decode(text[start:end])
+        except json.JSONDecodeError:
+            continue
+
+def extract_json(text, opener="{"):
+    """
+    Decode the first JSON object (or array) in a text, repairing it if it does not decode as is.
+
+    :return: The decoded value and whether a repair was needed.
+    :raises ValueError: If no decodable JSON is found.
+    """
+    for value, repaired in iter_json_values(text, opener):
+        return value, repaired
+    if find_json_span(text, opener) is None:
+        raise ValueError("No JSON found in the response.")
+    raise ValueError("Failed to decode JSON.")
+
+def validate_question_schema(question) -> list:
+    """
+    Check a decoded question against the quiz schema.
+
+    :return: A list of problems; empty if the question is valid.
+    """
+    if not isinstance(question, dict):
+        return ["question is not a JSON object"]
+
+    errors = []
+    if not isinstance(question.get("question"), str) or not question["question"].strip():
+        errors.append("missing question text")
+    if not isinstance(question.get("explanation"), str) or not question["explanation"].strip():
+        errors.append("missing explanation")
+
+    choices = question.get("choices")
+    if not isinstance(choices, list) or len(choices) != 4:
+        errors.append("choices must be a list of 4 items")
+        return errors
+    if not all(isinstance(choice, dict) and "key" in choice and "value" in choice for choice in choices):
+        errors.append("every choice needs a key and a value")
+        return errors
+
+    keys = [str(choice["key"]) for choice in choices]
+    if len(set(keys)) != len(keys):
+        errors.append("choice keys are not unique")
+    if question.get("answer") not in keys:
+        errors.append("answer is not one of the choice keys")
+    return errors
+
+def _normalize_answer(question):
+    """
+    Reduce answers such as "B) Paris" or "b" to the bare choice key when that is unambiguous.
+    """
+    answer, choices = question.get("answer"), question.get("choices")
+    if not isinstance(answer, str) or not isinstance(choices, list):
+        return
+    keys = {str(choice.get("key")) for choice in choices if isinstance(choice, dict)}
+    candidate = answer.strip()[:1].upper()
+    if answer not in keys and candidate in keys and not answer.strip()[1:2].isalnum():
+        question["answer"] = candidate
+
+def holds_valid_question(text) -> bool:
+    """
+    Tell whether a response holds at least one schema-valid question, as an object or in an array. Nothing is counted or logged.
+    """
+    for opener in ("{", "["):
+        for value, _ in iter_json_values(text, opener):
+            for question in (value if isinstance(value, list) else [value]):
+                if isinstance(question, dict):
+                    _normalize_answer(question)
+                if not validate_question_schema(question):
+                    return True
+    return False
+
+class QuestionParser:
+    """
+    Turn raw LLM output into schema-valid question dictionaries and count what went wrong.
+
+    'metrics' holds the number of responses parsed, repaired, rejected because no JSON could be
+    decoded, rejected by the schema check, LLM calls that failed outright, and retries by the caller.
+    """
+
+    def __init__(self):
+        self.metrics = {"parsed": 0, "repaired": 0, "extraction_failures": 0, "schema_failures": 0, "call_failures": 0, "retries": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, metric, amount=1):
+        with self._lock:
+            self.metrics[metric] += amount
+
+    def record_retry(self):
+        self._count("retries")
+
+    def record_call_failure(self):
+        self._count("call_failures")
+
+    def _validate(self, question) -> list:
+        if isinstance(question, dict):
+            _normalize_answer(question)
+        return validate_question_schema(question)
+
+    def parse(self, text):
+        """
+        Parse one question from a response.
+
+        Every top-level JSON object in the response is tried in order, so an example object before
+        the real answer does not hide a valid question that follows it. A response cut off inside
+        its object counts as an extraction failure, not as a schema failure of the objects in it.
+
+        :return: The question dictionary, or None if the response holds no valid question.
+        """
+        errors = None
+        for question, repaired in iter_json_values(text):
+            errors = self._validate(question)
+            if not errors:
+                if repaired:
+                    self._count("repaired")
+                self._count("parsed")
+                return question
+
+        if errors is None:
+            logger.info("No decodable JSON object in the response.")
+            self._count("extraction_failures")
+        else:
+            logger.info("Invalid question: %s", ", ".join(errors))
+            self._count("schema_failures")
+        return None
+
+    def parse_many(self, text) -> list:
+        """
+        Parse a JSON array of questions from a response, dropping the invalid items.
+
+        The first array in the response that holds at least one valid question is used.
+        """
+        first_invalid = None
+        for questions, repaired in iter_json_values(text, opener="["):
+            valid, invalid = [], 0
+            for question in questions:
+                errors = self._validate(question)
+                if errors:
+                    invalid += 1
+                    logger.info("Invalid question: %s", ", ".join(errors))
+                else:
+                    valid.append(question)
+            if valid:
+                if repaired:
+                    self._count("repaired")
+                self._count("parsed", len(valid))
+                self._count("schema_failures", invalid)
+                return valid
+            if first_invalid is None:
+                first_invalid = invalid
+
+        if first_invalid is None:
+            logger.info("No decodable JSON array in the response.")
+            self._count("extraction_failures")
+        else:
+            self._count("schema_failures", first_invalid)
+        return []
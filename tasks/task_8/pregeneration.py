@@ -0,0 +1,122 @@
+import os
+import threading
+from collections import OrderedDict
+
+from tasks.task_8.task_8 import QuizGenerator
+
+SECTION_PAGES = 5  # Consecutive pages of a document that make up one section
+
+def section_key(metadata, pages_per_section=SECTION_PAGES) -> str:
+    """
+    Name the section a page or chunk belongs to, from its document hash and page number.
+    """
+    return f"section:{str(metadata.get('doc_hash', ''))[:16]}:{int(metadata.get('page') or 0) // pages_per_section}"
+
+def _section_title(pages) -> str:
+    # The first non-empty line of a section usually names it; otherwise fall back to the file name
+    for page in pages:
+        for line in page.page_content.splitlines():
+            if len(line.strip()) > 3:
+                return line.strip()[:80]
+    return str(pages[0].metadata.get("source", "this document"))
+
+class PregenerationWorker:
+    """
+    Background worker that fills the QuestionStore with questions for every section of an indexed corpus.
+
+    It walks the processed pages section by section, generates questions from each section's own
+    text with the QuizGenerator prompt, and stores them under the section's key. QuizGenerator
+    serves them when a quiz topic retrieves chunks from that section. The worker runs on a
+    daemon thread at the lowest scheduling priority, skips sections that are already stocked,
+    and stops once it has generated 'max_questions' or stop() is called.
+
+    :param chroma_creator: A ChromaCollectionCreator whose collection has been created.
+    :param question_store: The QuestionStore to fill.
+    :param questions_per_section: How many questions to keep for each section.
+    :param max_questions: The generation budget for one run of the worker.
+    :param pages_per_section: How many consecutive pages make up a section.
+    :param llm: An optional LLM to use; by default the generator initializes its own.
+    """
+
+    def __init__(self, chroma_creator, question_store, questions_per_section=3, max_questions=60,
+                 pages_per_section=SECTION_PAGES, llm=None):
+        self.chroma_creator = chroma_creator
+        self.corpus_key = chroma_creator.version
+        self.question_store = question_store
+        self.questions_per_section = questions_per_section
+        self.max_questions = max_questions
+        self.pages_per_section = pages_per_section
+        self.llm = llm
+        self.generated = 0
+        self.sections_done = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _sections(self):
+        """
+        Group the processed pages into sections, in document and page order.
+        """
+        sections = OrderedDict()
+        for page in self.chroma_creator.processor.pages:
+            sections.setdefault(section_key(page.metadata, self.pages_per_section), []).append(page)
+        return sections.items()
+
+    def _run(self):
+        try:
+            # Only lower this thread's priority; on Linux each thread has its own nice value
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+        try:
+            for key, pages in self._sections():
+                if self._stop.is_set() or self.generated >= self.max_questions:
+                    break
+
+                stocked = self.question_store.count(self.corpus_key, key)
+                wanted = min(self.questions_per_section - stocked, self.max_questions - self.generated)
+                if wanted <= 0:
+                    continue
+
+                generator = QuizGenerator(topic=_section_title(pages), num_questions=wanted)
+                if self.llm is not None:
+                    generator.llm = self.llm
+                else:
+                    generator.init_llm()
+                generator.set_contexts([[page] for page in pages])
+
+                for question in generator.iter_questions(wanted):
+                    if question is not None:
+                        generator.add_question(question)
+                self.question_store.put(self.corpus_key, key, generator.question_bank)
+                self.generated += len(generator.question_bank)
+                self.sections_done += 1
+        except Exception as e:
+            self.error = e
+            print(f"Question pre-generation stopped: {e}")
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+def start_pregeneration(chroma_creator, question_store, **kwargs):
+    """
+    Start a PregenerationWorker for the creator's corpus, unless one is already running for it in this process.
+    """
+    with _workers_lock:
+        worker = _workers.get(chroma_creator.version)
+        if worker is None or not worker.running:
+            worker = PregenerationWorker(chroma_creator, question_store, **kwargs).start()
+            _workers[chroma_creator.version] = worker
+        return worker
@@ -0,0 +1,66 @@
+import re
+import threading
+
+from langchain_core.prompts import PromptTemplate
+
+# Words are cut into pieces of at most four characters, roughly how subword tokenizers split them
+_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+def estimate_tokens(text) -> int:
+    """
+    Estimate how many tokens a text costs, without calling a remote tokenizer.
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+class PromptBuilder:
+    """
+    Format a prompt template with as much retrieved context as fits in a token budget.
+
+    The template is compiled once. Context documents are expected in order of relevance and
+    are added whole until the next one would exceed 'token_budget'; if even the first one does
+    not fit, it is cut down to the budget. The size of every built prompt is recorded in 'prompt_sizes'.
+
+    :param template: A prompt template string with a {context} variable.
+    :param token_budget: The most estimated tokens of context to include.
+    """
+
+    def __init__(self, template, token_budget=1500):
+        self.prompt_template = PromptTemplate.from_template(template)
+        self.token_budget = token_budget
+        self.prompt_sizes = []  # One size record per built prompt
+        self._lock = threading.Lock()
+
+    def pack(self, documents):
+        """
+        Join the leading documents that fit in the token budget into one context string.
+
+        :return: The context string, its estimated token count and the number of documents it draws on.
+        """
+        parts, used = [], 0
+        for doc in documents:
+            tokens = estimate_tokens(doc.page_content)
+            if used + tokens > self.token_budget:
+                if not parts:
+                    # Keep the share of the most relevant chunk that fits
+                    keep = int(len(doc.page_content) * self.token_budget / tokens)
+                    parts.append(doc.page_content[:keep])
+                    used = estimate_tokens(parts[0])
+                break
+            parts.append(doc.page_content)
+            used += tokens
+        return ' '.join(parts), used, len(parts)
+
+    def build(self, documents, **variables) -> str:
+        """
+        Format the template with the packed context and the other template variables.
+        """
+        context, context_tokens, chunks = self.pack(documents)
+        prompt = self.prompt_template.format(context=context, **variables)
+        with self._lock:
+            self.prompt_sizes.append({
+                "prompt_tokens": estimate_tokens(prompt),
+                "context_tokens": context_tokens,
+                "chunks": chunks,
+                "chunks_dropped": len(documents) - chunks
+            })
+        return prompt
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+from tasks.task_5.retrieval_cache import normalize_topic
+
+class QuestionStore:
+    """
+    Persistent store of validated quiz questions in SQLite, keyed by corpus and normalized topic.
+
+    The corpus key identifies the exact set of indexed chunks (see ChromaCollectionCreator.version),
+    so questions are only served for the material they were generated from. Rows are evicted
+    least recently served first once 'max_questions' is exceeded, and with 'max_age' set,
+    questions older than that many seconds are no longer served and are purged.
+
+    :param path: Location of the SQLite database file; ":memory:" keeps the store in memory.
+    :param max_questions: The most questions kept across all corpora and topics.
+    :param max_age: Optional freshness limit in seconds.
+    """
+
+    def __init__(self, path="question_store.sqlite3", max_questions=50_000, max_age=None):
+        self.path = path
+        self.max_questions = max_questions
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, corpus TEXT NOT NULL, topic TEXT NOT NULL, "
+            "question_hash TEXT NOT NULL, question TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL, "
+            "UNIQUE (corpus, topic, question_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS questions_last_used ON questions (last_used)")
+        self._conn.commit()
+
+    def get(self, corpus, topic, limit) -> list:
+        """
+        Return up to 'limit' stored questions for a corpus and topic, oldest first.
+        """
+        now = time.time()
+        oldest = now - self.max_age if self.max_age is not None else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, question FROM questions WHERE corpus = ? AND topic = ? AND created_at >= ? ORDER BY id LIMIT ?",
+                (corpus, normalize_topic(topic), oldest, limit)
+            ).fetchall()
+            if rows:
+                self._conn.executemany("UPDATE questions SET last_used = ? WHERE id = ?", [(now, row_id) for row_id, _ in rows])
+                self._conn.commit()
+            self.hits += len(rows)
+            self.misses += limit - len(rows)
+        return [json.loads(question) for _, question in rows]
+
+    def count(self, corpus, topic) -> int:
+        """
+        Return how many fresh questions are stored for a corpus and topic, without serving them.
+        """
+        oldest = time.time() - self.max_age if self.max_age is not None else 0
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM questions WHERE corpus = ? AND topic = ? AND created_at >= ?",
+                (corpus, normalize_topic(topic), oldest)
+            ).fetchone()[0]
+
+    def put(self, corpus, topic, questions):
+        """
+        Store validated questions for a corpus and topic, then apply the freshness and size limits.
+        """
+        now = time.time()
+        rows = []
+        for question in questions:
+            encoded = json.dumps(question, sort_keys=True)
+            rows.append((corpus, normalize_topic(topic), hashlib.sha256(encoded.encode("utf-8")).hexdigest(), encoded, now, now))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO questions (corpus, topic, question_hash, question, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            if self.max_age is not None:
+                self._conn.execute("DELETE FROM questions WHERE created_at < ?", (now - self.max_age,))
+            excess = self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0] - self.max_questions
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM questions WHERE id IN (SELECT id FROM questions ORDER BY last_used, id LIMIT ?)",
+                    (excess,)
+                )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+@st.cache_resource
+def get_question_store(path="question_store.sqlite3"):
+    """
+    Return the process-wide QuestionStore for a database path.
+    """
+    return QuestionStore(path)
@@ -1,13 +1,22 @@
 import streamlit as st
-from langchain_google_vertexai import VertexAI
-from langchain_core.prompts import PromptTemplate
 import os
 import sys
-import json
+import random
+import threading
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 sys.path.append(os.path.abspath('../../'))
+from tasks.task_7.llm_backends import LLM_CALL_ERRORS, LLMCallError, create_llm
+from tasks.task_8.context_selection import select_context_slices
+from tasks.task_8.prompt_builder import PromptBuilder
+from tasks.task_8.json_extraction import QuestionParser, holds_valid_question
+from tasks.task_8.dedup import MinHashLSHIndex
 
 class QuizGenerator:
-    def __init__(self, topic=None, num_questions=1, vectorstore=None):
+    def __init__(self, topic=None, num_questions=1, vectorstore=None, max_concurrency=1, generation_mode="per_question",
+                 fetch_k=20, context_k=4, context_token_budget=1500, max_retries=2, retry_backoff=1.0,
+                 dedup_threshold=0.8, dedup_index=None, question_store=None, corpus_key=None, serve_sections=False):
         """
         Initializes the QuizGenerator with a required topic, the number of questions for the quiz,
         and an optional vectorstore for querying related information.
@@ -15,6 +24,24 @@ class QuizGenerator:
         :param topic: A string representing the required topic of the quiz.
         :param num_questions: An integer representing the number of questions to generate for the quiz, up to a maximum of 10.
         :param vectorstore: An optional vectorstore instance (e.g., ChromaDB) to be used for querying information related to the quiz topic.
+        :param max_concurrency: How many questions may be generated at the same time; 1 generates them one after another.
+        :param generation_mode: "per_question" sends one prompt per question; "batch" asks for all questions as one
+                                JSON array in a single call and only falls back to per-question calls for missing
+                                or invalid items.
+        :param fetch_k: How many candidate chunks generate_quiz retrieves once for the whole quiz.
+        :param context_k: How many of those chunks go into the context of each question.
+        :param context_token_budget: The most estimated tokens of context put in a single-question prompt.
+        :param max_retries: How many times a question whose call fails or whose response is not valid JSON for the schema
+                            is requested again.
+        :param retry_backoff: Seconds to wait, at most, before retrying a failed call; doubled for every further retry.
+                              The wait is drawn at random, so concurrent questions hitting a quota do not retry together.
+        :param dedup_threshold: The estimated similarity at which a question counts as a repeat of an earlier one.
+                                Slots whose question is rejected as a repeat are requested again, up to 'max_retries' times.
+        :param dedup_index: An optional long-lived MinHashLSHIndex shared with other quizzes; by default each quiz gets its own.
+        :param question_store: An optional QuestionStore; stored questions for the same corpus and topic are served first.
+        :param corpus_key: Identifies the indexed corpus in the question store, e.g. ChromaCollectionCreator.version.
+        :param serve_sections: Also serve questions pre-generated for the document sections the topic retrieves
+                               (see PregenerationWorker).
         """
         if not topic:
             self.topic = "General Knowledge"
@@ -24,9 +51,28 @@ class QuizGenerator:
         if num_questions > 10:
             raise ValueError("Number of questions cannot exceed 10.")
         self.num_questions = num_questions
+        self.max_concurrency = max_concurrency
+        if generation_mode not in ("per_question", "batch"):
+            raise ValueError(f"Unknown generation mode: {generation_mode}")
+        self.generation_mode = generation_mode
+        self.fetch_k = fetch_k
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.parser = QuestionParser()  # Extraction, repair and retry counts are in self.parser.metrics
+        self.context_k = context_k
+        self._context_slices = None  # Per-question context documents, set by prepare_contexts
+        self._slice_counter = itertools.count()
 
         self.vectorstore = vectorstore
         self.llm = None
+        self.question_bank = []
+        self.dedup_threshold = dedup_threshold
+        self._shared_dedup_index = dedup_index
+        self.dedup_index = dedup_index if dedup_index is not None else MinHashLSHIndex(dedup_threshold)
+        self._bank_lock = threading.Lock()  # Guards the uniqueness check and append as one step
+        self.question_store = question_store
+        self.corpus_key = corpus_key
+        self.serve_sections = serve_sections
         self.system_template = """
         You are a subject matter expert on the topic: {topic}
             
@@ -51,24 +97,165 @@ class QuizGenerator:
             
         Context: {context}
         """
+        self.batch_template = """
+        You are a subject matter expert on the topic: {topic}
+
+        Follow the instructions to create {count} different quiz questions:
+        1. Generate each question based on the topic provided and context as key "question"
+        2. Provide 4 multiple choice answers to each question as a list of key-value pairs "choices"
+        3. Provide the correct answer for each question from its list of answers as key "answer"
+        4. Provide an explanation as to why the answer is correct as key "explanation"
+        5. Do not repeat a question or ask the same thing in different words
+
+        You must respond as a JSON array of {count} objects, each with the following structure:
+        [
+            {{
+                "question": "<question>",
+                "choices": [
+                    {{"key": "A", "value": "<choice>"}},
+                    {{"key": "B", "value": "<choice>"}},
+                    {{"key": "C", "value": "<choice>"}},
+                    {{"key": "D", "value": "<choice>"}}
+                ],
+                "answer": "<answer key from choices list>",
+                "explanation": "<explanation as to why the answer is correct>"
+            }}
+        ]
+
+        Context: {context}
+        """
+        self.max_output_tokens = 400  # Per question; batch calls scale this by the number of questions
+
+        # Compile the templates once; the batch prompt gets twice the context budget
+        self.prompt_builder = PromptBuilder(self.system_template, context_token_budget)
+        self.batch_prompt_builder = PromptBuilder(self.batch_template, 2 * context_token_budget)
     
-    def init_llm(self):
+    def init_llm(self, backend="vertex", cache=None, **llm_kwargs):
         """
         Initialize the Large Language Model (LLM) for quiz question generation.
+
+        :param backend: "vertex" (gemini-pro), "fake" for the deterministic local FakeQuizLLM, or a langchain language model.
+        :param cache: An optional langchain BaseCache for responses. Responses without a valid question are not cached,
+                      so retrying them calls the backend again.
+        :param llm_kwargs: Backend settings, e.g. temperature for Vertex or latency for the fake.
         """
-        self.llm = VertexAI(
-            model_name="gemini-pro",
-            temperature=0.7,  # Example value; adjust as needed
-            max_output_tokens=400  # Example value within recommended range
-        )
+        if backend == "vertex":
+            llm_kwargs.setdefault("max_output_tokens", self.max_output_tokens)
+        self.llm = create_llm(backend, cache=cache, cache_filter=holds_valid_question, **llm_kwargs)
         
-    def generate_question_with_vectorstore(self):
+    def generate_question_with_vectorstore(self, attempt=0, slot=None):
         """
         Generate a quiz question using the topic provided and context from the vectorstore.
+
+        :param attempt: How many times this question has been requested before; passed to the LLM as run metadata.
+        :param slot: The question's place in the quiz, which picks its prepared context slice; the next slice if None.
+
+        Raises:
+        - LLMCallError: If the LLM call fails; retrying it may succeed.
         """
         if not self.llm:
             raise ValueError("LLM is not initialized.")
         
+        # Format the retrieved context and the quiz topic into a structured prompt
+        formatted_prompt = self.prompt_builder.build(self._retrieve_context(slot=slot), topic=self.topic)
+        
+        # Generate the quiz question using the LLM
+        try:
+            response = self.llm.generate([formatted_prompt], metadata={"attempt": attempt})  # Pass prompt as a list
+        except LLM_CALL_ERRORS as e:
+            raise LLMCallError(f"Failed to generate question. {type(e).__name__}: {e}") from e
+        
+        # Extract the text from the LLMResult object
+        question_str = response.generations[0][0].text  # Correctly accessing the first text result
+
+        return question_str
+
+    def prepare_contexts(self, num_slices):
+        """
+        Retrieve candidate chunks for the topic once, and split them into a different context slice per question.
+
+        The 'fetch_k' candidates are spread over 'num_slices' slices of 'context_k' chunks with maximal
+        marginal relevance over their embeddings, so each question sees a different part of the material.
+        Later calls to generate_question_with_vectorstore take the slices in turn instead of searching again.
+        """
+        if not self.vectorstore:
+            raise ValueError("Vectorstore is not initialized.")
+
+        try:
+            candidates = self.vectorstore.similarity_search(self.topic, k=self.fetch_k)
+        except AttributeError:
+            raise ValueError("Vectorstore does not have a 'similarity_search' method.")
+
+        if not candidates:
+            raise ValueError("No documents found for the given topic.")
+
+        embeddings = getattr(self.vectorstore, "embeddings", None)
+        if embeddings is not None:
+            # The store already holds the candidates' vectors; only re-embed them if it cannot return them
+            candidate_vectors = self._stored_vectors(candidates)
+            if candidate_vectors is None:
+                candidate_vectors = embeddings.embed_documents([doc.page_content for doc in candidates])
+            slices = select_context_slices(
+                embeddings.embed_query(self.topic),
+                candidate_vectors,
+                num_slices,
+                slice_size=self.context_k
+            )
+        else:
+            # Without embeddings, deal the candidates out in rank order
+            slices = [
+                list(range(start, len(candidates), num_slices))[:self.context_k] or [start % len(candidates)]
+                for start in range(num_slices)
+            ]
+
+        self.set_contexts([[candidates[index] for index in indices] for indices in slices])
+
+    def _stored_vectors(self, candidates):
+        """
+        Return the embeddings the vectorstore holds for the candidate chunks, in order, or None if it cannot return all of them.
+
+        Chunks are looked up by the 'chunk_id' ChromaCollectionCreator records in their metadata.
+        """
+        ids = [doc.metadata.get("chunk_id") for doc in candidates]
+        if not all(ids):
+            return None
+        try:
+            stored = self.vectorstore.get(ids=list(dict.fromkeys(ids)), include=["embeddings"])
+        except Exception:
+            return None
+        if stored.get("embeddings") is None:
+            return None
+        vectors = dict(zip(stored["ids"], stored["embeddings"]))
+        if any(chunk_id not in vectors for chunk_id in ids):
+            return None
+        return [vectors[chunk_id] for chunk_id in ids]
+
+    def set_contexts(self, context_slices):
+        """
+        Use the given lists of documents, in turn, as the context of the questions generated from now on.
+        """
+        self._context_slices = context_slices
+        self._slice_counter = itertools.count()
+
+    def _retrieve_context(self, combined=False, slot=None) -> list:
+        """
+        Return the context documents for a prompt, most relevant first: a prepared slice, or a fresh search if there are none.
+
+        :param combined: Use the best chunks of all slices together, for a prompt that asks for several questions.
+        :param slot: Use the slice of this question slot, so its retries see the same material; the next slice if None.
+        """
+        if self._context_slices:
+            if combined:
+                # Interleave the slices so the context leads with the top chunk of each one
+                return list({
+                    id(doc): doc
+                    for doc in itertools.chain.from_iterable(itertools.zip_longest(*self._context_slices))
+                    if doc is not None
+                }.values())
+            if slot is None:
+                slot = next(self._slice_counter)  # Atomic, so concurrent questions each get their own slice
+            return self._context_slices[slot % len(self._context_slices)]
+
         if not self.vectorstore:
             raise ValueError("Vectorstore is not initialized.")
         
@@ -81,57 +268,218 @@ class QuizGenerator:
         if not documents:
             raise ValueError("No documents found for the given topic.")
 
-        # Format the retrieved context and the quiz topic into a structured prompt
-        prompt_template = PromptTemplate.from_template(self.system_template)
-        formatted_prompt = prompt_template.format(topic=self.topic, context=' '.join(doc.page_content for doc in documents))
-        
-        # Generate the quiz question using the LLM
+        return documents
+
+    def generate_questions_batch(self, count) -> list:
+        """
+        Generate several questions with a single LLM call that returns them as one JSON array.
+
+        The system prompt and the retrieved context are sent once instead of once per question.
+
+        Returns:
+        - The schema-valid question dictionaries from the response; malformed or missing items are dropped.
+        """
+        if not self.llm:
+            raise ValueError("LLM is not initialized.")
+
+        formatted_prompt = self.batch_prompt_builder.build(self._retrieve_context(combined=True), topic=self.topic, count=count)
+
         try:
-            response = self.llm.generate([formatted_prompt])  # Pass prompt as a list
-        except ValueError as e:
-            raise ValueError(f"Failed to generate question. Error: {str(e)}")
-        
-        # Extract the text from the LLMResult object
-        question_str = response.generations[0][0].text  # Correctly accessing the first text result
+            response = self.llm.generate([formatted_prompt], max_output_tokens=self.max_output_tokens * count)
+        except LLM_CALL_ERRORS as e:
+            raise LLMCallError(f"Failed to generate questions. {type(e).__name__}: {e}") from e
 
-        return question_str
+        questions_str = response.generations[0][0].text
+        return self.parser.parse_many(questions_str)[:count]
+
+    def _run_slots(self, task, count, in_order=True, first_slot=0, **task_kwargs):
+        """
+        Call 'task' once per question slot, as task(slot=<index>, **task_kwargs), and yield the results.
+
+        With 'max_concurrency' above 1 the calls run in a thread pool, so a quiz takes roughly
+        as long as its slowest call instead of the sum of all of them. Results come in slot
+        order, or as soon as each call finishes with in_order=False.
+        """
+        slots = range(first_slot, first_slot + count)
+        if self.max_concurrency <= 1 or count <= 1:
+            for slot in slots:
+                yield task(slot=slot, **task_kwargs)
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, count)) as pool:
+            futures = [pool.submit(task, slot=slot, **task_kwargs) for slot in slots]
+            for future in (futures if in_order else as_completed(futures)):
+                yield future.result()
+
+    def iter_question_strings(self, count, in_order=True):
+        """
+        Generate 'count' raw question strings, yielding them in request order unless in_order=False.
+        """
+        return self._run_slots(self.generate_question_with_vectorstore, count, in_order)
+
+    def iter_questions(self, count, in_order=True, first_slot=0, first_attempt=0):
+        """
+        Generate 'count' schema-valid question dictionaries, yielding None for slots that kept failing.
+
+        :param first_slot: The slot number of the first question, which picks its context slice.
+        :param first_attempt: The attempt number of the first call per slot; later rounds pass higher ones for fresh responses.
+        """
+        return self._run_slots(self.generate_valid_question, count, in_order, first_slot, first_attempt=first_attempt)
+
+    def generate_valid_question(self, slot=None, first_attempt=0):
+        """
+        Generate and parse one question, requesting only this slot again while the call fails or the response is unusable.
+
+        Only failed LLM calls (LLMCallError) are retried; any other error is raised. Every attempt uses the
+        slot's context slice and passes its attempt number to the LLM, so a run is reproducible.
+
+        Returns:
+        - A schema-valid question dictionary, or None after 'max_retries' failed retries.
+        """
+        if not self.llm:
+            raise ValueError("LLM is not initialized.")
+
+        for attempt in range(first_attempt, first_attempt + self.max_retries + 1):
+            if attempt > first_attempt:
+                self.parser.record_retry()
+            try:
+                question_str = self.generate_question_with_vectorstore(attempt, slot)
+            except LLMCallError as e:
+                print(e)
+                self.parser.record_call_failure()
+                if attempt < first_attempt + self.max_retries:
+                    # Exponential backoff with full jitter, so slots that hit a quota together spread their retries
+                    time.sleep(random.uniform(0, self.retry_backoff * 2 ** (attempt - first_attempt)))
+                continue
+            # Unusable responses are counted by the parser and retried here too
+            question = self.parser.parse(question_str)
+            if question is not None:
+                return question
+        return None
 
     def generate_quiz(self) -> list:
         """
         Task: Generate a list of unique quiz questions based on the specified topic and number of questions.
 
         This method orchestrates the quiz generation process by utilizing the `generate_question_with_vectorstore` method to generate each question and the `validate_question` method to ensure its uniqueness before adding it to the quiz.
+        The questions are produced by iter_quiz, which callers that show questions as they arrive use directly.
 
         Returns:
         - A list of dictionaries, where each dictionary represents a unique quiz question generated based on the topic.
         """
+        for _ in self.iter_quiz():
+            pass
+        return self.question_bank
+
+    def iter_quiz(self, in_order=True):
+        """
+        Build the quiz and yield every question as soon as it is accepted into the question bank.
+
+        Stored questions for this corpus and topic are served first. The shortfall is retrieved for once,
+        generated (with one batch call first in batch mode) and deduplicated, and the new questions are
+        stored once the quiz is complete.
+
+        :param in_order: Accept generated questions in slot order; with False each is accepted as soon as its call finishes.
+        """
         self.question_bank = []  # Reset the question bank
+        if self._shared_dedup_index is None:
+            self.dedup_index = MinHashLSHIndex(self.dedup_threshold)
 
-        for _ in range(self.num_questions):
-            # Generate a question string using the class method
-            question_str = self.generate_question_with_vectorstore()
+        # Serve questions already generated for this corpus and topic, and only generate the shortfall
+        served = self.serve_from_store()
+        yield from list(self.question_bank)
+        if served == self.num_questions:
+            return
 
-            # Convert the JSON string to a dictionary
+        # Retrieve once for the whole quiz and give every question its own slice of the material
+        self.prepare_contexts(self.num_questions - served)
+
+        # In batch mode, one call provides most of the quiz and only the shortfall is generated per question
+        if self.generation_mode == "batch":
             try:
-                question = json.loads(question_str)
-            except (json.JSONDecodeError, IndexError, KeyError):
-                print("Failed to decode question JSON.")
-                continue  # Skip this iteration if JSON decoding fails
-
-            # Validate the question for uniqueness
-            if self.validate_question(question):
-                print("Successfully generated a unique question.")
-                self.question_bank.append(question)  # Add the valid and unique question to the bank
-            else:
-                print("Duplicate or invalid question detected.")
+                batch = self.generate_questions_batch(self.num_questions - served)
+            except LLMCallError as e:
+                print(e)  # The per-question pass below makes up the shortfall
+                self.parser.record_call_failure()
+                batch = []
+            for question in batch:
+                if self.add_question(question):
+                    yield question
 
-        return self.question_bank
+        # Slots rejected as repeats are requested again, each round with the next context slice and fresh attempts
+        wanted = self.num_questions - len(self.question_bank)
+        for round_number in range(self.max_retries + 1):
+            if wanted <= 0:
+                break
+            rejected = 0
+            first_attempt = round_number * (self.max_retries + 1)
+            for question in self.iter_questions(wanted, in_order, first_slot=round_number, first_attempt=first_attempt):
+                if question is None:
+                    print(f"No valid question after {self.max_retries + 1} attempts; skipping this slot.")
+                    continue  # Skip this slot if it never produced a valid question
+
+                # Validate the question for uniqueness
+                if self.add_question(question):
+                    print("Successfully generated a unique question.")
+                    yield question
+                else:
+                    print("Duplicate or invalid question detected.")
+                    rejected += 1
+            wanted = rejected
+
+        self.save_to_store(self.question_bank[served:])
+
+    def serve_from_store(self) -> int:
+        """
+        Add stored questions for this corpus and topic to the question bank.
+
+        Returns:
+        - The number of questions added.
+        """
+        if self.question_store is None or not self.corpus_key:
+            return 0
+        stored = self.question_store.get(self.corpus_key, self.topic, self.num_questions - len(self.question_bank))
+        served = sum(self.add_question(question) for question in stored)
+
+        # Top up from the pre-generated pools of the sections this topic retrieves
+        if self.serve_sections and served < self.num_questions and self.vectorstore:
+            from tasks.task_8.pregeneration import section_key
+
+            documents = self.vectorstore.similarity_search(self.topic, k=self.context_k)
+            for key in dict.fromkeys(section_key(doc.metadata) for doc in documents):
+                for question in self.question_store.get(self.corpus_key, key, self.num_questions - served):
+                    served += self.add_question(question)
+        return served
+
+    def save_to_store(self, questions):
+        """
+        Keep newly generated, validated questions for later quizzes on the same corpus and topic.
+        """
+        if self.question_store is not None and self.corpus_key and questions:
+            self.question_store.put(self.corpus_key, self.topic, questions)
+
+    def add_question(self, question: dict) -> bool:
+        """
+        Add a question to the question bank if it is valid and not a near duplicate of an earlier question.
+
+        The check and the append happen under one lock, so concurrent callers cannot both add the same question.
+
+        Returns:
+        - A boolean value: True if the question was added, False otherwise.
+        """
+        with self._bank_lock:
+            if "question" not in question or not self.dedup_index.add_if_unique(question["question"]):
+                return False
+            self.question_bank.append(question)  # Add the valid and unique question to the bank
+            return True
 
     def validate_question(self, question: dict) -> bool:
         """
         Task: Validate a quiz question for uniqueness within the generated quiz.
 
-        This method checks if the provided question (as a dictionary) is unique based on its text content compared to previously generated questions stored in `question_bank`.
+        This method checks if the provided question (as a dictionary) is unique based on its text content compared to previously generated questions.
+        Exact repeats and close paraphrases are both caught by a MinHash/LSH index over the question texts, which
+        only compares against similar questions instead of scanning the whole bank.
 
         Returns:
         - A boolean value: True if the question is unique, False otherwise.
@@ -139,11 +487,7 @@ class QuizGenerator:
         if "question" not in question:
             return False
         
-        for existing_question in self.question_bank:
-            if question["question"] == existing_question["question"]:
-                return False  # Duplicate found
-        
-        return True
+        return not self.dedup_index.is_duplicate(question["question"])
 
 
 # Test the Object
@@ -2,10 +2,11 @@ import streamlit as st
 import os
 import sys
 import json
+from typing import NamedTuple
 
 sys.path.append(os.path.abspath('../../'))
+from tasks.task_7.llm_backends import create_llm
 
-from langchain_google_vertexai import VertexAI
 from langchain_core.prompts import PromptTemplate
 
 class QuizGenerator:
@@ -46,12 +47,8 @@ class QuizGenerator:
         Context: {context}
         """
 
-    def init_llm(self):
-        self.llm = VertexAI(
-            model_name="gemini-pro",
-            temperature=0.7,
-            max_output_tokens=400
-        )
+    def init_llm(self, backend="vertex", cache=None, **llm_kwargs):
+        self.llm = create_llm(backend, cache=cache, **llm_kwargs)
         
     def generate_question_with_vectorstore(self):
         if not self.llm:
@@ -111,10 +108,50 @@ class QuizGenerator:
         return True
 
 
+class QuizQuestion(NamedTuple):
+    """
+    An immutable, tuple-backed quiz question, kept in session state instead of the raw LLM dictionary.
+    """
+    question: str
+    choices: tuple      # ((key, value), ...)
+    answer: str
+    explanation: str = ""
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuizQuestion":
+        """
+        Build a QuizQuestion from a question dictionary in the LLM response format.
+        """
+        return cls(
+            question=data["question"],
+            choices=tuple((choice["key"], choice["value"]) for choice in data["choices"]),
+            answer=data["answer"],
+            explanation=data.get("explanation", "")
+        )
+
+    @property
+    def choice_labels(self) -> list:
+        """
+        The choices formatted for display, e.g. "A) Paris".
+        """
+        return [f"{key}) {value}" for key, value in self.choices]
+
+    def is_correct(self, label: str) -> bool:
+        """
+        Check whether a choice label selected by the user is the correct answer.
+        """
+        return label is not None and label.startswith(f"{self.answer})")
+
 class QuizManager:
     def __init__(self, questions: list):
-        self.questions = questions
-        self.total_questions = len(questions)
+        """
+        :param questions: QuizQuestion records; question dictionaries are converted on the way in.
+        """
+        self.questions = [
+            question if isinstance(question, QuizQuestion) else QuizQuestion.from_dict(question)
+            for question in questions
+        ]
+        self.total_questions = len(self.questions)
 
     def get_question_at_index(self, index: int):
         valid_index = index % self.total_questions
@@ -180,23 +217,16 @@ if __name__ == "__main__":
             with st.form("Multiple Choice Question"):
                 index_question = quiz_manager.get_question_at_index(question_index)
                 
-                choices = []
-                for choice in index_question['choices']:
-                    choice_key = choice["key"]
-                    choice_value = choice["value"]
-                    choices.append(f"{choice_key}) {choice_value}")
-                
-                st.write(index_question['question'])
+                st.write(index_question.question)
                 
                 answer = st.radio(
                     'Choose the correct answer',
-                    choices
+                    index_question.choice_labels
                 )
                 submit_button = st.form_submit_button("Submit")
                 
                 if submit_button:
-                    correct_answer_key = index_question['answer']
-                    if answer.startswith(correct_answer_key):
+                    if index_question.is_correct(answer):
                         st.success("Correct!")
                     else:
                         st.error("Incorrect!")